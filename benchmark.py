@@ -0,0 +1,160 @@
+""" Headless benchmarks for deskpet, printed as JSON so builds can be compared """
+import os
+import sys
+
+# Run without a display unless a platform was asked for explicitly
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import argparse
+import json
+import statistics
+import subprocess
+import time
+
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import QTimer
+
+import deskpet
+
+COLD_START_SCRIPT = """
+import deskpet
+from PyQt5.QtWidgets import QApplication
+app = QApplication([])
+selector = deskpet.SpriteSelector()
+selector.show()
+app.processEvents()
+print('ready', flush=True)
+"""
+
+def summarize(samples, scale=1.0):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return {
+        'count': len(ordered),
+        'mean': statistics.fmean(ordered) * scale,
+        'p50': ordered[len(ordered) // 2] * scale,
+        'p95': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * scale,
+        'max': ordered[-1] * scale,
+    }
+
+def bench_cold_start(runs):
+    # Full process start up to the first shown selector, interpreter included
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        child = subprocess.Popen([sys.executable, '-c', COLD_START_SCRIPT],
+                                 cwd=os.path.dirname(os.path.abspath(deskpet.__file__)),
+                                 stdout=subprocess.PIPE, text=True)
+        child.stdout.readline()
+        samples.append(time.perf_counter() - start)
+        child.wait()
+    return summarize(samples, 1000)
+
+def bench_animation_load(runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        deskpet.SpriteAnimation(deskpet.PetPack(deskpet.resource_path(deskpet.DEFAULT_PACK)))
+        samples.append(time.perf_counter() - start)
+    return summarize(samples, 1000)
+
+def time_calls(pets, method, calls):
+    samples = []
+    for _ in range(calls):
+        for pet in pets:
+            start = time.perf_counter()
+            getattr(pet, method)()
+            samples.append(time.perf_counter() - start)
+    return summarize(samples, 1e6)
+
+def time_moves(engine, calls):
+    # The engine's movement tick for the whole population, one redraw interval per call
+    samples = []
+    now = engine.now()
+    engine.simulation.sync_clock(now)
+    for _ in range(calls):
+        now += engine.MOVE_INTERVAL
+        start = time.perf_counter()
+        engine.move(now)
+        samples.append(time.perf_counter() - start)
+    return summarize(samples, 1e6)
+
+def record_frames(pet, lateness):
+    update_animation = pet.update_animation
+    last = {}
+    
+    def timed_update(now=None):
+        called = time.monotonic()
+        if last:
+            # Positive when the frame changed after the boundary goose.json asked for
+            lateness.append(called - last['boundary'])
+        remaining = update_animation(now)
+        last['boundary'] = (called if now is None else now) + remaining / 1000
+        return remaining
+    
+    # The engine looks the method up on every tick, so an instance attribute wins
+    pet.update_animation = timed_update
+
+def bench_pets(app, count, duration, overlay):
+    engine = deskpet.PetEngine(None, overlay)
+    pets = engine.spawn(count, sprite_size=96, max_travel=850)
+    # Scale the frames up front so background loading doesn't count as frame lateness
+    for pet in pets:
+        pet.update_scale()
+    deskpet.asset_loader.wait()
+    
+    lateness = []
+    for pet in pets:
+        record_frames(pet, lateness)
+    
+    engine.wakeups = 0
+    start = time.monotonic()
+    QTimer.singleShot(round(duration * 1000), app.quit)
+    app.exec_()
+    elapsed = time.monotonic() - start
+    wakeups = engine.wakeups
+    
+    for pet in pets:
+        del pet.update_animation
+        pet.is_moving = True
+    result = {
+        'pets': count,
+        'wakeups_per_second': wakeups / elapsed,
+        'frame_jitter_ms': summarize(lateness, 1000),
+        'update_animation_us': time_calls(pets, 'update_animation', 20),
+        'movement_tick_us': time_moves(engine, 20 * len(pets)),
+    }
+    engine.despawn_all()
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--pets', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--duration', type=float, default=5.0,
+                        help='seconds of event loop per pet count')
+    parser.add_argument('--runs', type=int, default=5,
+                        help='repetitions for the startup measurements')
+    parser.add_argument('--overlay', action='store_true')
+    parser.add_argument('--output', help='write the JSON here instead of stdout')
+    args = parser.parse_args()
+    
+    results = {
+        'platform': os.environ['QT_QPA_PLATFORM'],
+        'overlay': args.overlay,
+        'cold_start_ms': bench_cold_start(args.runs),
+    }
+    
+    app = QApplication(sys.argv[:1])
+    results['animation_load_ms'] = bench_animation_load(args.runs)
+    results['runs'] = [bench_pets(app, count, args.duration, args.overlay) for count in args.pets]
+    
+    report = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report)
+    else:
+        print(report)
+
+if __name__ == '__main__':
+    main()
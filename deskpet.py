@@ -1,18 +1,214 @@
 import sys
 import os
+import time
+
+# Taken before the Qt imports so the startup timeline covers them too
+STARTUP_TIME = time.perf_counter()
+
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QLabel, QFileDialog, 
                            QPushButton, QVBoxLayout, QHBoxLayout, QWidget, 
-                           QMessageBox, QDialog, QSlider, QCheckBox, QMenu)
-from PyQt5.QtCore import Qt, QTimer, QThread, QObject, pyqtSignal, QRectF
-from PyQt5.QtGui import QPixmap, QTransform, QPainter, QColor, QLinearGradient, QRegion, QPainterPath, QIcon
+                           QMessageBox, QDialog, QSlider, QCheckBox, QMenu, QPlainTextEdit)
+from PyQt5.QtCore import (Qt, QTimer, QThread, QObject, pyqtSignal, pyqtSlot, QRectF, QRect, QPointF, QSizeF,
+                          QStandardPaths, QEvent, QAbstractNativeEventFilter, QThreadPool, QRunnable)
+from PyQt5.QtGui import QPixmap, QTransform, QPainter, QColor, QLinearGradient, QRegion, QPainterPath, QIcon, QMouseEvent, QImage, QBitmap, QFontDatabase, QCursor
+from PyQt5.QtNetwork import QLocalServer, QLocalSocket
+import argparse
+import bisect
 import ctypes
+import functools
+import getpass
+import gzip
+import hashlib
+import heapq
 import json
-from itertools import cycle
+import math
+import mmap
+import random
+import struct
+import threading
+import zipfile
+from collections import OrderedDict
+from itertools import accumulate
+from string import Template
+
+# NumPy is imported by the first PetSimulation, it takes longer to import than Qt
+np = None
+
+def load_numpy():
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:  # PetSimulation falls back to plain Python loops
+            numpy = False
+        np = numpy
+    return np
 
 # Hide console window
 if sys.platform == 'win32':
     ctypes.windll.user32.ShowWindow(ctypes.windll.kernel32.GetConsoleWindow(), 0)
 
+class StartupTimeline:
+    """ Logs how long each startup phase takes, enabled with --timeline or DESKPET_TIMELINE=1 """
+    def __init__(self):
+        self.marks = []
+        self.enabled = False
+        if os.environ.get('DESKPET_TIMELINE', '0') != '0':
+            self.enable()
+    
+    def enable(self):
+        if not self.enabled:
+            self.enabled = True
+            # Report whatever happened before we were switched on
+            for mark in self.marks:
+                self.report(*mark)
+    
+    def mark(self, phase):
+        # Each phase is logged once, the first time it is reached
+        if any(seen == phase for seen, _ in self.marks):
+            return
+        self.marks.append((phase, time.perf_counter()))
+        if self.enabled:
+            self.report(*self.marks[-1])
+    
+    def report(self, phase, when):
+        index = next(i for i, (seen, _) in enumerate(self.marks) if seen == phase)
+        previous = self.marks[index - 1][1] if index else STARTUP_TIME
+        print(f"[timeline] {phase:<22} +{(when - previous) * 1000:7.1f} ms"
+              f"  ({(when - STARTUP_TIME) * 1000:7.1f} ms)", file=sys.stderr, flush=True)
+
+timeline = StartupTimeline()
+timeline.mark('imports')
+
+class Histogram:
+    """ Count, total, max and power-of-two buckets of a duration in microseconds """
+    __slots__ = ('count', 'total', 'max', 'buckets')
+    
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * 40
+    
+    def add(self, seconds):
+        us = max(0.0, seconds * 1e6)
+        self.count += 1
+        self.total += us
+        self.max = max(self.max, us)
+        # Bucket i holds everything under 2**i us
+        self.buckets[min(int(us).bit_length(), len(self.buckets) - 1)] += 1
+    
+    def percentile(self, fraction):
+        """ Upper bound of the bucket holding the given fraction of samples """
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if seen >= fraction * self.count:
+                return 2 ** bucket
+        return self.max
+    
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean_us': self.total / self.count if self.count else 0.0,
+            'p50_us': self.percentile(0.5),
+            'p95_us': self.percentile(0.95),
+            'max_us': self.max,
+            'histogram_us': {f'<{2 ** bucket}': count for bucket, count in enumerate(self.buckets) if count},
+        }
+
+def resident_memory():
+    """ Resident set size of the process in bytes, None where it can't be read """
+    if sys.platform == 'win32':
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [('cb', ctypes.c_ulong), ('PageFaultCount', ctypes.c_ulong)] + [
+                (field, ctypes.c_size_t) for field in (
+                    'PeakWorkingSetSize', 'WorkingSetSize', 'QuotaPeakPagedPoolUsage', 'QuotaPagedPoolUsage',
+                    'QuotaPeakNonPagedPoolUsage', 'QuotaNonPagedPoolUsage', 'PagefileUsage', 'PeakPagefileUsage')]
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return counters.WorkingSetSize
+        return None
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+class PerfStats:
+    """ Callback durations, timer lateness and frame and cache counters, recorded while enabled
+    
+    Enabled with --stats, DESKPET_STATS=1 or by opening Stats from a pet's menu.
+    """
+    # Frames shown later than this after their deadline count as late
+    LATE_FRAME = 1 / 60
+    
+    def __init__(self):
+        self.enabled = False
+        self.reset()
+        if os.environ.get('DESKPET_STATS', '0') != '0':
+            self.enable()
+    
+    def enable(self):
+        if not self.enabled:
+            self.enabled = True
+            self.since = time.monotonic()
+    
+    def reset(self):
+        self.since = time.monotonic()
+        self.durations = {}
+        self.lateness = {}
+        self.counters = {}
+    
+    def add_duration(self, name, seconds):
+        histogram = self.durations.get(name)
+        if histogram is None:
+            histogram = self.durations[name] = Histogram()
+        histogram.add(seconds)
+    
+    def add_lateness(self, name, seconds):
+        histogram = self.lateness.get(name)
+        if histogram is None:
+            histogram = self.lateness[name] = Histogram()
+        histogram.add(seconds)
+    
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+    
+    def snapshot(self, **extra):
+        return dict({
+            'enabled': self.enabled,
+            'seconds': time.monotonic() - self.since,
+            'resident_bytes': resident_memory(),
+            'pixmap_budget_bytes': {'used': pixmap_budget.used, 'limit': pixmap_budget.limit},
+            'callbacks': {name: histogram.summary() for name, histogram in self.durations.items()},
+            'lateness': {name: histogram.summary() for name, histogram in self.lateness.items()},
+            'counters': dict(self.counters),
+        }, **extra)
+    
+    def dump(self, path, **extra):
+        with open(path, 'w') as f:
+            json.dump(self.snapshot(**extra), f, indent=2)
+
+perf_stats = PerfStats()
+
+def instrumented(name):
+    """ Time every call of the decorated function into perf_stats, a flag check when disabled """
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not perf_stats.enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                perf_stats.add_duration(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
 def resource_path(relative_path):
     """ Get absolute path to resource, works for dev and for PyInstaller """
     try:
@@ -21,6 +217,179 @@ def resource_path(relative_path):
         base_path = os.path.abspath(".")
     return os.path.join(base_path, relative_path)
 
+def next_deadline(deadline, interval, now):
+    """ Chain periodic deadlines without drift, resyncing after falling a whole interval behind """
+    deadline += interval
+    if deadline < now:
+        deadline = now + interval
+    return deadline
+
+# App palette, every color in the theme comes from here
+PALETTE = {
+    'text': '#2c3e50',
+    'accent': '#FA8E24',
+    'accent_dark': '#DD7714',
+    'button': '#3498db',
+    'button_hover': '#2980b9',
+    'button_pressed': '#2473a7',
+    'disabled': '#bdc3c7',
+    'glass': 'rgba(255, 255, 255, 0.92)',
+    # Painted by hand rather than styled, so these are spelled the way QColor reads them (#AARRGGBB)
+    'track': '#E9E9EA',
+    'handle': '#FFFFFF',
+    'panel': '#F5FFFFFF',
+    'panel_border': '#7F000000',
+}
+
+# One stylesheet for the whole app, parsed once when it is installed. Windows opt in
+# through their object name (#selector, #reminder), settings cards through the "card" property.
+THEME = Template("""
+    #selector {
+        border-radius: 15px;
+        background-color: $glass;
+    }
+    #titleBar {
+        background-color: transparent;
+        border-top-left-radius: 15px;
+        border-top-right-radius: 15px;
+    }
+    #selector #closeButton, #selector #minimizeButton {
+        background-color: transparent;
+        border: none;
+        border-radius: 10px;
+        min-width: 20px;
+        min-height: 20px;
+        padding: 4px;
+        color: $text;
+        font-size: 16px;
+    }
+    #selector #closeButton:hover {
+        background-color: rgba(255, 0, 0, 0.7);
+        color: white;
+    }
+    #selector #minimizeButton:hover {
+        background-color: rgba(128, 128, 128, 0.3);
+        color: white;
+    }
+    #selector QLabel {
+        color: $text;
+        font-size: 12px;
+    }
+    #selector QPushButton {
+        background-color: $button;
+        border: none;
+        color: white;
+        padding: 8px 16px;
+        border-radius: 5px;
+        font-size: 12px;
+        min-width: 80px;
+        margin: 5px;
+    }
+    #selector QPushButton:hover {
+        background-color: $button_hover;
+    }
+    #selector QPushButton:pressed {
+        background-color: $button_pressed;
+    }
+    #selector QPushButton:disabled {
+        background-color: $disabled;
+    }
+    #selector QSlider {
+        margin: 10px;
+    }
+    #selector QSlider::groove:horizontal {
+        border: 1px solid $disabled;
+        height: 8px;
+        background: #e0e0e0;
+        margin: 2px 0;
+        border-radius: 4px;
+    }
+    #selector QSlider::handle:horizontal {
+        background: $accent;
+        border: none;
+        width: 18px;
+        margin: -5px 0;
+        border-radius: 9px;
+    }
+    #selector QSlider::handle:horizontal:hover {
+        background: $accent_dark;
+    }
+    #selector QCheckBox {
+        color: $text;
+        font-size: 12px;
+        padding: 5px;
+    }
+    #selector QCheckBox::indicator {
+        width: 18px;
+        height: 18px;
+        border-radius: 3px;
+    }
+    #selector QCheckBox::indicator:unchecked {
+        border: 2px solid $disabled;
+    }
+    #selector QCheckBox::indicator:checked {
+        background-color: $button;
+        border: 2px solid $button;
+    }
+    #selector QWidget[card="true"], #selector QWidget[card="true"] QWidget {
+        border: 0.5px solid rgba(0, 0, 0, 0.65);
+        border-radius: 16px;
+        padding: 6px;
+    }
+    #selector QWidget[card="true"] QLabel, #selector QWidget[card="true"] QSlider {
+        border: none;
+    }
+    #selector #startButton {
+        background-color: $accent;
+        border: none;
+        color: black;
+        padding: 0px;
+        border-radius: 16px;
+        font-size: 14px;
+        min-width: 360px;
+        width: 360px;
+        max-width: 360px;
+        height: 64px;
+        max-height: 64px;
+    }
+    #selector #startButton:hover {
+        background-color: $accent_dark;
+    }
+    #selector #startButton:disabled {
+        background-color: #EDEDED;
+        color: #808080;
+    }
+    
+    #reminder, #reminder QWidget {
+        border-radius: 15px;
+        border: 1px solid rgba(255, 255, 255, 0.3);
+        background-color: $glass;
+    }
+    #reminder QLabel {
+        color: $text;
+        font-size: 12px;
+        padding: 10px;
+        border: none;
+        background-color: transparent;
+    }
+    #reminder QPushButton {
+        background-color: $accent;
+        border: none;
+        color: black;
+        padding: 8px 16px;
+        border-radius: 5px;
+        font-size: 12px;
+        min-width: 80px;
+    }
+    #reminder QPushButton:hover, #reminder QPushButton:pressed {
+        background-color: $accent_dark;
+    }
+""").substitute(PALETTE)
+
+def install_theme(app):
+    """ Style every deskpet window from the single app-wide stylesheet """
+    app.setStyleSheet(THEME)
+
 class ReminderWindow(QMainWindow):
     def __init__(self, reminder_type="Hydration"):
         super().__init__()
@@ -28,39 +397,8 @@ class ReminderWindow(QMainWindow):
         self.setAttribute(Qt.WA_TranslucentBackground)
         self.setWindowTitle("Reminder")
         
-        # Style for the reminder window
-        self.setStyleSheet("""
-            QMainWindow {
-                background-color: transparent;
-            }
-            QWidget {
-                border-radius: 15px;
-                border: 1px solid rgba(255, 255, 255, 0.3);
-                background-color: rgba(255, 255, 255, 0.92);
-            }
-            QLabel {
-                color: #2c3e50;
-                font-size: 12px;
-                padding: 10px;
-                border: none;
-                background-color: transparent;
-            }
-            QPushButton {
-                background-color: #FA8E24;
-                border: none;
-                color: black;
-                padding: 8px 16px;
-                border-radius: 5px;
-                font-size: 12px;
-                min-width: 80px;
-            }
-            QPushButton:hover {
-                background-color: #DD7714;
-            }
-            QPushButton:pressed {
-                background-color: #DD7714;
-            }
-        """)
+        # Styled by the app theme
+        self.setObjectName("reminder")
         
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
@@ -68,16 +406,125 @@ class ReminderWindow(QMainWindow):
         layout.setContentsMargins(20, 20, 20, 20)
         layout.setSpacing(15)
         
-        label = QLabel(f"{reminder_type} check!")
-        label.setAlignment(Qt.AlignCenter)
-        layout.addWidget(label)
+        self.label = QLabel()
+        self.label.setAlignment(Qt.AlignCenter)
+        layout.addWidget(self.label)
         
         ok_button = QPushButton("OK")
-        ok_button.clicked.connect(self.hide)
+        ok_button.clicked.connect(self.dismiss)
         ok_button.setCursor(Qt.PointingHandCursor)
         layout.addWidget(ok_button)
         
-        self.setFixedSize(200, 120)
+        # Reminders that fire while the window is still up are added to it
+        self.pending = []
+        self.set_reminders([reminder_type])
+    
+    def set_reminders(self, reminder_types):
+        self.pending = list(reminder_types)
+        self.label.setText("\n".join(f"{reminder_type} check!" for reminder_type in self.pending))
+        self.setFixedSize(200, 100 + 20 * len(self.pending))
+    
+    def show_reminders(self, reminder_types):
+        if self.isVisible():
+            reminder_types = self.pending + [name for name in reminder_types if name not in self.pending]
+        self.set_reminders(reminder_types)
+        self.show()
+        self.raise_()
+        self.activateWindow()
+    
+    def dismiss(self):
+        self.pending = []
+        self.hide()
+
+class ReminderScheduler(QObject):
+    """ Every reminder on one timer, with due times kept in a heap """
+    # Longest wait between checks, so a suspend is noticed soon after resume
+    MAX_WAIT = 60.0
+    # The wall clock running this far ahead of the monotonic clock means the machine slept
+    SLEEP_TOLERANCE = 2.0
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # name -> (interval in seconds, generation); heap entries of an older generation are stale
+        self.reminders = {}
+        self.queue = []
+        self.generation = 0
+        self.window = None  # One notification window shared by every reminder
+        
+        self.slept = 0.0
+        self.last_seen = (time.monotonic(), time.time())
+        
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.VeryCoarseTimer)
+        self.timer.timeout.connect(self.check)
+    
+    def now(self):
+        """ Monotonic time that also counts time spent suspended """
+        monotonic, wall = time.monotonic(), time.time()
+        last_monotonic, last_wall = self.last_seen
+        gap = (wall - last_wall) - (monotonic - last_monotonic)
+        if gap > self.SLEEP_TOLERANCE:
+            self.slept += gap
+        self.last_seen = (monotonic, wall)
+        return monotonic + self.slept
+    
+    def add(self, name, interval):
+        """ Remind about `name` every `interval` seconds, replacing an earlier reminder of that name """
+        # A zero interval would keep the reminder due forever and spin check()
+        if not interval > 0:
+            raise ValueError(f"reminder interval must be positive, got {interval!r}")
+        now = self.now()
+        self.generation += 1
+        self.reminders[name] = (interval, self.generation)
+        heapq.heappush(self.queue, (now + interval, self.generation, name))
+        self.schedule(now)
+    
+    def remove(self, name):
+        self.reminders.pop(name, None)
+        self.schedule(self.now())
+    
+    def clear(self):
+        self.reminders.clear()
+        self.queue = []
+        self.timer.stop()
+    
+    def is_current(self, entry):
+        _, generation, name = entry
+        reminder = self.reminders.get(name)
+        return reminder is not None and reminder[1] == generation
+    
+    @instrumented('reminders')
+    def check(self):
+        now = self.now()
+        due = []
+        while self.queue and self.queue[0][0] <= now:
+            deadline, generation, name = heapq.heappop(self.queue)
+            if not self.is_current((deadline, generation, name)):
+                continue
+            if perf_stats.enabled:
+                perf_stats.add_lateness('reminders', now - deadline)
+            # However many periods were missed while asleep, remind once and resync
+            due.append(name)
+            interval = self.reminders[name][0]
+            heapq.heappush(self.queue, (next_deadline(deadline, interval, now), generation, name))
+        if due:
+            self.notify(due)
+        self.schedule(now)
+    
+    def schedule(self, now):
+        while self.queue and not self.is_current(self.queue[0]):
+            heapq.heappop(self.queue)
+        if not self.queue:
+            self.timer.stop()
+            return
+        wait = min(self.queue[0][0] - now, self.MAX_WAIT)
+        self.timer.start(max(0, math.ceil(wait * 1000)))
+    
+    def notify(self, names):
+        if self.window is None:
+            self.window = ReminderWindow()
+        self.window.show_reminders(names)
 
 class ToggleSwitch(QCheckBox):
     def __init__(self, parent=None):
@@ -94,75 +541,653 @@ class ToggleSwitch(QCheckBox):
         
         # Draw the background
         if self.isChecked():
-            painter.setBrush(QColor("#FA8E24"))  # Changed from #34C759 to #FA8E24
+            painter.setBrush(QColor(PALETTE['accent']))
         else:
-            painter.setBrush(QColor("#E9E9EA"))  # Light gray
+            painter.setBrush(QColor(PALETTE['track']))
             
         painter.setPen(Qt.NoPen)
         painter.drawRoundedRect(0, 0, self.width(), self.height(), 12, 12)
         
         # Draw the handle (white circle)
-        painter.setBrush(QColor("white"))
+        painter.setBrush(QColor(PALETTE['handle']))
         if self.isChecked():
             painter.drawEllipse(22, 2, 20, 20)  # Right position
         else:
             painter.drawEllipse(2, 2, 20, 20)   # Left position
 
+class FrameScheduler(QObject):
+    """ Wakes up exactly when the current frame ends instead of polling every few ms """
+    # Timers may fire a hair early, look frames up slightly ahead so we never land just before a boundary
+    EARLY = 0.002
+    
+    def __init__(self, callback, parent=None):
+        super().__init__(parent)
+        # callback(when) shows the frame due at `when` and returns ms from `when` until it ends
+        self.callback = callback
+        
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.next_frame)
+    
+    def start(self):
+        self.next_frame()
+    
+    def stop(self):
+        self.timer.stop()
+    
+    def isActive(self):
+        return self.timer.isActive()
+    
+    def next_frame(self):
+        now = time.monotonic()
+        when = now + self.EARLY
+        remaining = self.callback(when)
+        self.timer.start(max(0, round((when - now) * 1000 + remaining)))
+
+# Compiled atlas: magic, header length, JSON index, then raw premultiplied ARGB32 frames
+ATLAS_MAGIC = b'DPATLAS1'
+ATLAS_ALIGN = 16
+DEFAULT_PACK = os.path.join('packs', 'goose')
+
+class PetPack:
+    """ A pet's sprite sheet, frame data and animation tags, read from a directory or zip holding manifest.json """
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.archive = zipfile.ZipFile(self.path) if zipfile.is_zipfile(self.path) else None
+        self.manifest = json.loads(self.read('manifest.json'))
+        self.name = self.manifest.get('name', os.path.splitext(os.path.basename(self.path))[0])
+        # Animation name -> {"match": frame name tag, "duration_scale": optional slowdown},
+        # or {"mirror": other animation} for the opposite facing, flipped when drawn
+        self.animations = self.manifest['animations']
+        self.mirrors = {name: tags['mirror'] for name, tags in self.animations.items() if 'mirror' in tags}
+    
+    def read(self, name):
+        if self.archive is not None:
+            return self.archive.read(name)
+        with open(os.path.join(self.path, name), 'rb') as f:
+            return f.read()
+    
+    def digest(self):
+        digest = hashlib.sha256()
+        for name in ('manifest.json', self.manifest['sheet'], self.manifest['frames']):
+            digest.update(self.read(name))
+        return digest.hexdigest()
+    
+    def atlas_paths(self):
+        """ Atlas bundled inside a pack directory first, then the per-user cache """
+        cache_dir = os.path.join(QStandardPaths.writableLocation(QStandardPaths.GenericCacheLocation), 'deskpet')
+        # Packs may share a name, so the cache entry is tied to where the pack lives
+        cache_name = f"{self.name}-{hashlib.sha1(self.path.encode('utf-8')).hexdigest()[:8]}.atlas"
+        bundled = [] if self.archive is not None else [os.path.join(self.path, 'pack.atlas')]
+        return bundled + [os.path.join(cache_dir, cache_name)]
+
+def group_frames(pack):
+    """ Sheet rectangles and durations of the pack's frames grouped by animation, without touching pixels """
+    data = json.loads(pack.read(pack.manifest['frames']))
+    
+    animations = {name: [] for name in pack.animations}
+    for frame_name, frame_data in data['frames'].items():
+        for name, tags in pack.animations.items():
+            if name not in pack.mirrors and tags['match'] in frame_name.lower():
+                break
+        else:
+            continue
+        
+        # Some animations are slowed down by multiplying their durations
+        duration = frame_data['duration'] * tags.get('duration_scale', 1)
+        frame_rect = frame_data['frame']
+        animations[name].append(((frame_rect['x'], frame_rect['y'], frame_rect['w'], frame_rect['h']), duration))
+    
+    # Mirrored animations play the frames of the one they mirror
+    for name, source in pack.mirrors.items():
+        animations[name] = list(animations[source])
+    return animations
+
+def decode_frames(pack):
+    """ Slice the pack's sprite sheet into premultiplied frame images grouped by animation """
+    sheet = QImage.fromData(pack.read(pack.manifest['sheet'])).convertToFormat(QImage.Format_ARGB32_Premultiplied)
+    return {
+        name: [(sheet.copy(*frame_rect), duration) for frame_rect, duration in frames]
+        for name, frames in group_frames(pack).items() if name not in pack.mirrors
+    }
+
+def write_atlas(atlas_path, digest, images):
+    index = {'hash': digest, 'animations': {}}
+    blobs = []
+    offset = 0
+    for name, frames in images.items():
+        entries = index['animations'][name] = []
+        for image, duration in frames:
+            entries.append([offset, image.width(), image.height(), image.bytesPerLine(), duration])
+            blob = image.constBits().asstring(image.byteCount())
+            blobs.append(blob)
+            offset += len(blob)
+    
+    header = json.dumps(index, separators=(',', ':')).encode('utf-8')
+    data_start = -(-(len(ATLAS_MAGIC) + 4 + len(header)) // ATLAS_ALIGN) * ATLAS_ALIGN
+    header = header.ljust(data_start - len(ATLAS_MAGIC) - 4)
+    
+    # Write next to the final path and swap in, so readers never see half a file
+    os.makedirs(os.path.dirname(atlas_path), exist_ok=True)
+    temp_path = atlas_path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(ATLAS_MAGIC)
+        f.write(struct.pack('<I', len(header)))
+        f.write(header)
+        for blob in blobs:
+            f.write(blob)
+    os.replace(temp_path, atlas_path)
+
+def load_atlas(atlas_path, digest):
+    """ Map a compiled atlas, or return None when missing or stale
+    
+    Returns the frame entries per animation and a view of the frame data, nothing is decoded yet.
+    """
+    try:
+        with open(atlas_path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    
+    try:
+        if mapped[:len(ATLAS_MAGIC)] != ATLAS_MAGIC:
+            raise ValueError('not a deskpet atlas')
+        header_start = len(ATLAS_MAGIC) + 4
+        header_length, = struct.unpack_from('<I', mapped, len(ATLAS_MAGIC))
+        index = json.loads(bytes(mapped[header_start:header_start + header_length]))
+        if index['hash'] != digest:
+            raise ValueError('atlas is stale')
+    except (ValueError, KeyError, struct.error):
+        mapped.close()
+        return None
+    
+    return index['animations'], memoryview(mapped)[header_start + header_length:]
+
+def compile_atlas(pack, atlas_path=None):
+    """ Precompute the atlas for a pet pack, inside the pack directory by default """
+    write_atlas(atlas_path or pack.atlas_paths()[0], pack.digest(), decode_frames(pack))
+
+class PixmapBudget:
+    """ Least recently shown scaled frames are dropped once all packs together go over the limit """
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self.entries = OrderedDict()  # key -> (bytes, callback dropping the pixmaps)
+    
+    def add(self, key, size, evict):
+        # A key added again replaces its entry, its old size must not stay charged
+        self.discard(key)
+        self.entries[key] = (size, evict)
+        self.used += size
+        # Whatever was just added is about to be shown, so it always stays
+        while self.used > self.limit and len(self.entries) > 1:
+            _, (size, evict) = self.entries.popitem(last=False)
+            self.used -= size
+            evict()
+            if perf_stats.enabled:
+                perf_stats.count('strips evicted')
+    
+    def touch(self, key):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+    
+    def discard(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.used -= entry[0]
+
+pixmap_budget = PixmapBudget(32 * 1024 * 1024)
+
 class SpriteAnimation:
-    def __init__(self, sprite_sheet, animation_data):
-        self.sprite_sheet = QPixmap(sprite_sheet)
+    # Smallest level of the scaling pyramid, in device pixels
+    PYRAMID_MIN = 16
+    
+    def __init__(self, pack):
+        self.pack = pack
         
-        with open(resource_path(animation_data), 'r') as f:
-            self.data = json.load(f)
-            
-        self.frames = {}
-        self.frame_cycles = {}
-        
-        # Group frames by animation type
-        walk_right = []
-        walk_left = []
-        idle_right = []
-        idle_left = []
-        
-        for frame_name, frame_data in self.data['frames'].items():
-            frame_rect = frame_data['frame']
-            duration = frame_data['duration']
-            
-            # Slow down idle animations by multiplying duration
-            if 'idle-' in frame_name.lower():
-                duration *= 3  # Makes idle animations 3x slower
-                
-            x, y = frame_rect['x'], frame_rect['y']
-            w, h = frame_rect['w'], frame_rect['h']
-            
-            frame_pixmap = self.sprite_sheet.copy(x, y, w, h)
-            
-            if 'walk-right' in frame_name.lower():
-                walk_right.append((frame_pixmap, duration))
-            elif 'walk-left' in frame_name.lower():
-                walk_left.append((frame_pixmap, duration))
-            elif 'idle-right' in frame_name.lower():
-                idle_right.append((frame_pixmap, duration))
-            elif 'idle-left' in frame_name.lower():
-                idle_left.append((frame_pixmap, duration))
-        
-        self.frames = {
-            'walking-right': walk_right,
-            'walking-left': walk_left,
-            'idle-right': idle_right,
-            'idle-left': idle_left
-        }
+        # Prefer a compiled atlas, frames are read straight out of the mapping on demand.
+        # Without one the sheet is decoded by whichever loader thread needs it first.
+        self.digest = pack.digest()
+        self.atlas = None
+        self.images = None
+        self.decode_lock = threading.Lock()
+        for atlas_path in pack.atlas_paths():
+            self.atlas = load_atlas(atlas_path, self.digest)
+            if self.atlas is not None:
+                break
         
-        # Create cycles for each animation
-        self.frame_cycles = {
-            name: cycle(frames) 
-            for name, frames in self.frames.items()
-        }
+        # Cumulative frame end times per animation, so frames are looked up by elapsed time
+        self.timelines = {}
+        grouped = group_frames(pack)
+        for name, frames in grouped.items():
+            ends = list(accumulate(duration for _, duration in frames))
+            if ends:
+                self.timelines[name] = (ends, ends[-1])
+        self.behavior = Behavior(pack.manifest.get('behavior', DEFAULT_BEHAVIOR), self.timelines)
+        # Longest frame edge, the top level of the pyramid
+        self.source_size = max((max(rect[2], rect[3]) for frames in grouped.values() for rect, _ in frames),
+                               default=1)
+        
+        # Pre-scaled frames with their hit masks, one strip per (animation, pyramid level). Each level
+        # halves the one above it and is built the first time a size drawn from it is shown.
+        self.strips = {}
+        self.size_users = {}
+        # Frames as drawn at one size, borrowing the nearest level's pixmap and scaling it at paint time.
+        # Mirrored animations are flipped there as well: (animation, size, dpr) -> (borrowed strip, frames)
+        self.views = {}
+        # Levels a loader thread could not scale, a broken pack isn't decoded again on every wakeup
+        self.failed_strips = set()
+    
+    def frame_count(self, name):
+        return len(self.timelines[name][0])
+    
+    def decode(self):
+        """ Decode the sprite sheet and compile its atlas, once, on the first thread that needs frames """
+        with self.decode_lock:
+            if self.atlas is not None or self.images is not None:
+                return
+            images = decode_frames(self.pack)
+            atlas_path = self.pack.atlas_paths()[-1]
+            try:
+                write_atlas(atlas_path, self.digest, images)
+                self.atlas = load_atlas(atlas_path, self.digest)
+            except OSError:
+                pass  # Read-only cache, decode again next launch
+            if self.atlas is None:
+                self.images = images
+    
+    def frame_images(self, name):
+        """ Source frames of one animation as images, wrapping the atlas in place when there is one """
+        if self.atlas is None:
+            self.decode()
+        if self.atlas is None:
+            return self.images[name]
+        entries, data = self.atlas
+        return [(QImage(data[offset:offset + bytes_per_line * h], w, h, bytes_per_line,
+                        QImage.Format_ARGB32_Premultiplied), duration)
+                for offset, w, h, bytes_per_line, duration in entries[name]]
+    
+    def acquire_size(self, size, dpr=1.0):
+        """ Keep strips for a target size cached until released """
+        key = (size, dpr)
+        self.size_users[key] = self.size_users.get(key, 0) + 1
+    
+    def release_size(self, size, dpr=1.0):
+        """ Drop the views for a size once nobody displays it anymore. Its levels stay ready for the next
+        resize or screen change, until the pixmap budget needs the memory or the pack is unloaded.
+        """
+        key = (size, dpr)
+        users = self.size_users.get(key, 0) - 1
+        if users > 0:
+            self.size_users[key] = users
+            return
+        self.size_users.pop(key, None)
+        for view_key in [view_key for view_key in self.views if view_key[1:] == key]:
+            del self.views[view_key]
+    
+    def level_for(self, size, dpr=1.0):
+        """ Edge of the smallest pyramid level at least as large as `size` on screen, so drawing only shrinks it.
+        Sizes above the source frames are drawn from the top level.
+        """
+        device_size = max(size * dpr, self.PYRAMID_MIN)
+        level = self.source_size
+        while (level + 1) // 2 >= device_size:
+            level = (level + 1) // 2
+        return level
+    
+    def unload(self):
+        """ Give every strip back to the budget, once the registry lets go of this pack """
+        for strip_key in list(self.strips):
+            self.drop_strip(strip_key)
+        self.views.clear()
+        self.size_users.clear()
+    
+    def drop_strip(self, strip_key):
+        self.forget_strip(strip_key)
+        pixmap_budget.discard((self,) + strip_key)
+    
+    def forget_strip(self, strip_key):
+        """ Drop a strip along with the views borrowing its pixmap """
+        strip = self.strips.pop(strip_key, None)
+        for view_key in [view_key for view_key, (base, _) in self.views.items() if base is strip]:
+            del self.views[view_key]
+    
+    def strip_key(self, name, size, dpr):
+        """ Which strip the frames of an animation at a size are drawn from """
+        return self.pack.mirrors.get(name, name), self.level_for(size, dpr)
+    
+    def strip(self, name, size, dpr=1.0):
+        """ Frames and hit masks of one animation at a size, scaling its level right here if needed """
+        strip_key = self.strip_key(name, size, dpr)
+        if strip_key not in self.strips:
+            self.add_strip(strip_key, self.scale_strip(*strip_key))
+        return self.request_strip(name, size, dpr, queue=False)
+    
+    def request_strip(self, name, size, dpr=1.0, queue=True):
+        """ The frames when their level is ready, otherwise None after queueing it on the asset loader.
+        Until then another level of the animation that is already built stands in, scaled when drawn.
+        """
+        strip_key = self.strip_key(name, size, dpr)
+        base = self.strips.get(strip_key)
+        if perf_stats.enabled:
+            perf_stats.count('strip hits' if base is not None else 'strip misses')
+        if base is None:
+            if queue and strip_key not in self.failed_strips:
+                asset_loader.request(self, strip_key)
+            strip_key = self.nearest_strip(*strip_key)
+            if strip_key is None:
+                return None
+            base = self.strips[strip_key]
+        pixmap_budget.touch((self,) + strip_key)
+        return self.view(name, base, strip_key[1], size, dpr)
+    
+    def nearest_strip(self, name, level):
+        """ Key of the built level closest above `level`, or the largest one below it """
+        built = [strip_key[1] for strip_key in self.strips if strip_key[0] == name]
+        if not built:
+            return None
+        larger = [other for other in built if other >= level]
+        return name, min(larger) if larger else max(built)
+    
+    def view(self, name, base, level, size, dpr):
+        """ Frames of a level as drawn at `size`: target sizes, hit masks scaled to match, and
+        whether to flip them. Only the masks are new, the pixmap stays the level's.
+        """
+        key = (name, size, dpr)
+        cached = self.views.get(key)
+        if cached is None or cached[0] is not base:
+            mirrored = name in self.pack.mirrors
+            scale = size / level
+            frames = []
+            for sheet, source, mask in base:
+                target = QSizeF(source.size()) * scale
+                if mirrored:
+                    transform = QTransform(-scale, 0, 0, scale, target.width(), 0)
+                else:
+                    transform = QTransform.fromScale(scale, scale)
+                frames.append((sheet, source, target, transform.map(mask), mirrored))
+            cached = self.views[key] = (base, frames)
+        return cached[1]
+    
+    def prefetch(self, size, dpr=1.0, first=None):
+        """ Queue every animation at a size, `first` ahead of the rest """
+        names = sorted(self.timelines, key=lambda name: name != first)
+        for name in names:
+            self.request_strip(name, size, dpr)
+    
+    def scale_strip(self, name, level):
+        """ One image with every frame scaled down to a pyramid level side by side, plus frame rects
+        and alpha masks. Safe to run on a loader thread.
+        """
+        frames = self.frame_images(name)
+        sheet = QImage(level * len(frames), level, QImage.Format_ARGB32_Premultiplied)
+        sheet.fill(Qt.transparent)
+        sources = []
+        alphas = []
+        painter = QPainter(sheet)
+        for index, (image, _) in enumerate(frames):
+            scaled = self.scale_image(image, level)
+            painter.drawImage(index * level, 0, scaled)
+            sources.append(QRect(index * level, 0, scaled.width(), scaled.height()))
+            # Pixels at least half opaque count as the pet
+            alphas.append(scaled.createAlphaMask(Qt.ThresholdAlphaDither))
+        painter.end()
+        return sheet, sources, alphas
+    
+    def add_strip(self, strip_key, images):
+        """ Turn the scaled sheet into one shared pixmap and the masks into hit regions, on the GUI thread """
+        sheet, sources, alphas = images
+        sheet_pixmap = QPixmap.fromImage(sheet)
+        # Every frame is a rect of the same pixmap, QRegion keeps each mask as a short list of rects
+        strip = [(sheet_pixmap, source, QRegion(QBitmap.fromImage(alpha)))
+                 for source, alpha in zip(sources, alphas)]
+        self.strips[strip_key] = strip
+        pixmap_budget.add((self,) + strip_key, sheet.byteCount(), lambda: self.forget_strip(strip_key))
+        return strip
+    
+    def frame_at(self, name, elapsed):
+        """ Frame index showing `elapsed` ms into the looping animation, and ms until it ends """
+        ends, total = self.timelines[name]
+        position = elapsed % total
+        index = bisect.bisect_right(ends, position)
+        return index, ends[index] - position
+    
+    @staticmethod
+    def scale_image(image, device_size):
+        return image.scaled(device_size, device_size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
 
-class SpriteSelector(QDialog):
+class SpriteView(QWidget):
+    """ Paints one frame straight out of a shared strip pixmap, no per-frame pixmaps or label layout """
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.sheet = None
+        self.source = None
+        self.target = None
+        self.mirrored = False
+    
+    def set_frame(self, sheet, source, target, mirrored=False):
+        if sheet is self.sheet and source == self.source and target == self.target and mirrored == self.mirrored:
+            return
+        self.sheet = sheet
+        self.source = source
+        self.target = target
+        self.mirrored = mirrored
+        self.update()
+    
+    def paintEvent(self, event):
+        if self.sheet is not None:
+            self.draw_frame(QPainter(self), QPointF(0, 0), self.sheet, self.source, self.target, self.mirrored)
+    
+    @staticmethod
+    def draw_frame(painter, top_left, sheet, source, target_size, mirrored=False):
+        # The source rect is in pixels of a pyramid level, the target in logical ones. Levels are
+        # at most twice the size on screen, so filtering while drawing is all the scaling left.
+        target = QRectF(QPointF(top_left), target_size)
+        painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        if not mirrored:
+            painter.drawPixmap(target, sheet, QRectF(source))
+            return
+        # Flip around the middle of the target
+        painter.save()
+        painter.translate(target.left() + target.right(), 0)
+        painter.scale(-1, 1)
+        painter.drawPixmap(target, sheet, QRectF(source))
+        painter.restore()
+
+class StripJob(QRunnable):
+    """ Scales one animation strip on a loader thread """
+    def __init__(self, loader, animation, strip_key):
+        super().__init__()
+        self.loader = loader
+        self.animation = animation
+        self.strip_key = strip_key
+    
+    def run(self):
+        # An exception escaping a worker would abort the whole app
+        try:
+            images = self.animation.scale_strip(*self.strip_key)
+        except Exception as error:
+            print(f"Could not load {self.strip_key[0]} from {self.animation.pack.path}: {error}", file=sys.stderr)
+            images = None
+        self.loader.scaled.emit(self.animation, self.strip_key, images)
+
+class AssetLoader(QObject):
+    """ Decodes and scales frames on a pool of worker threads, pixmaps are only made on the GUI thread """
+    scaled = pyqtSignal(object, tuple, object)  # from the workers
+    strip_ready = pyqtSignal(object, str)  # animation, animation name
+    progress = pyqtSignal(int, int)  # strips done, strips requested since the loader was last idle
+    
+    def __init__(self):
+        super().__init__()
+        self.pool = QThreadPool(self)
+        self.pending = set()
+        self.done = 0
+        self.total = 0
+        self.scaled.connect(self.finish)
+    
+    def request(self, animation, strip_key):
+        job_key = (animation, strip_key)
+        if job_key in self.pending:
+            return
+        self.pending.add(job_key)
+        self.total += 1
+        self.pool.start(StripJob(self, animation, strip_key))
+        self.progress.emit(self.done, self.total)
+    
+    def finish(self, animation, strip_key, images):
+        self.pending.discard((animation, strip_key))
+        self.done += 1
+        if images is None:
+            animation.failed_strips.add(strip_key)
+        # The pack may have been released while its frames were scaled, or strip()
+        # may have scaled the same level on the GUI thread in the meantime
+        if images is not None and animation.size_users and strip_key not in animation.strips:
+            animation.add_strip(strip_key, images)
+            self.strip_ready.emit(animation, strip_key[0])
+        self.progress.emit(self.done, self.total)
+        if not self.pending:
+            self.done = self.total = 0
+    
+    def wait(self):
+        """ Block until every queued strip is ready, for tools without a running event loop """
+        while self.pending:
+            self.pool.waitForDone()
+            QApplication.processEvents()
+
+asset_loader = AssetLoader()
+
+class SessionEventFilter(QAbstractNativeEventFilter):
+    """ Picks session lock and remote disconnect notifications out of the Windows message stream """
+    WM_WTSSESSION_CHANGE = 0x02B1
+    INACTIVE = (2, 4, 7)  # console disconnect, remote disconnect, session lock
+    ACTIVE = (1, 3, 8)    # console connect, remote connect, session unlock
+    
+    def __init__(self, governor):
+        super().__init__()
+        self.governor = governor
+    
+    def nativeEventFilter(self, event_type, message):
+        if event_type == b'windows_generic_MSG':
+            import ctypes.wintypes
+            msg = ctypes.wintypes.MSG.from_address(int(message))
+            if msg.message == self.WM_WTSSESSION_CHANGE:
+                if msg.wParam in self.INACTIVE:
+                    self.governor.set_session_active(False)
+                elif msg.wParam in self.ACTIVE:
+                    self.governor.set_session_active(True)
+        return False, 0
+
+class ActivityGovernor(QObject):
+    """ Tells timers when nobody can see them: screen locked, session disconnected or screensaver on """
+    session_active_changed = pyqtSignal(bool)
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.session_active = True
+        self.watching = False
+        self.native_filter = None
+    
+    def watch(self, window):
+        if self.watching:
+            return
+        self.watching = True
+        
+        # Both sources push notifications, nothing is polled
+        if sys.platform == 'win32':
+            self.native_filter = SessionEventFilter(self)
+            QApplication.instance().installNativeEventFilter(self.native_filter)
+            ctypes.windll.wtsapi32.WTSRegisterSessionNotification(int(window.winId()), 0)  # NOTIFY_FOR_THIS_SESSION
+        else:
+            try:
+                from PyQt5.QtDBus import QDBusConnection
+            except ImportError:
+                return
+            QDBusConnection.sessionBus().connect('', '/org/freedesktop/ScreenSaver', 'org.freedesktop.ScreenSaver',
+                                                 'ActiveChanged', self.screensaver_changed)
+    
+    @pyqtSlot(bool)
+    def screensaver_changed(self, screensaver_active):
+        self.set_session_active(not screensaver_active)
+    
+    def set_session_active(self, active):
+        if active != self.session_active:
+            self.session_active = active
+            self.session_active_changed.emit(active)
+
+class SpriteRegistry:
+    """ Loads each pet pack once per process and shares it between the selector and pets """
     def __init__(self):
+        self.animations = {}
+        self.users = {}
+    
+    def acquire(self, pack_path):
+        key = os.path.abspath(pack_path)
+        if key not in self.animations:
+            self.animations[key] = SpriteAnimation(PetPack(key))
+        self.users[key] = self.users.get(key, 0) + 1
+        return self.animations[key]
+    
+    def release(self, animation):
+        for key, shared in self.animations.items():
+            if shared is animation:
+                break
+        else:
+            return
+        self.users[key] -= 1
+        if self.users[key] <= 0:
+            del self.users[key]
+            del self.animations[key]
+            animation.unload()
+
+sprite_registry = SpriteRegistry()
+
+class AnimationClock:
+    """ Maps monotonic time to frames of shared SpriteAnimation timelines for one consumer """
+    def __init__(self, animation, now=None):
+        self.animation = animation
+        # Consumers created at different times naturally play at different phases
+        self.origin = time.monotonic() if now is None else now
+        self.paused_at = None
+    
+    def elapsed(self, now):
+        if self.paused_at is not None:
+            now = self.paused_at
+        return (now - self.origin) * 1000
+    
+    def frame(self, name, now):
+        """ Frame index showing at `now` and ms until it ends, never ending while paused """
+        index, remaining = self.animation.frame_at(name, self.elapsed(now))
+        if self.paused_at is not None:
+            remaining = float('inf')
+        return index, remaining
+    
+    def seek(self, elapsed, now=None):
+        now = time.monotonic() if now is None else now
+        self.origin = (self.paused_at if self.paused_at is not None else now) - elapsed / 1000
+    
+    def pause(self, now=None):
+        if self.paused_at is None:
+            self.paused_at = time.monotonic() if now is None else now
+    
+    def resume(self, now=None):
+        if self.paused_at is not None:
+            now = time.monotonic() if now is None else now
+            self.origin += now - self.paused_at
+            self.paused_at = None
+
+class SpriteSelector(QDialog):
+    def __init__(self, overlay=False, pack=None, seed=None):
         super().__init__()
-        self.pet = None
+        self.pack = pack or resource_path(DEFAULT_PACK)
+        self.engine = PetEngine(self, overlay, seed)
+        self.engine.pets_changed.connect(self.update_start_button)
+        
+        # Preview and pets only run while someone can see them
+        self.governor = ActivityGovernor(self)
+        self.governor.session_active_changed.connect(self.engine.set_session_active)
+        self.governor.session_active_changed.connect(self.update_preview_timer)
+        self.engine.pets_changed.connect(self.update_preview_timer)
         self.sprite_size = 96
         self.setWindowFlags(Qt.FramelessWindowHint | Qt.Dialog)
         self.setAttribute(Qt.WA_TranslucentBackground)
@@ -170,137 +1195,72 @@ class SpriteSelector(QDialog):
         # Add window icon
         self.setWindowIcon(QIcon('icon.ico'))
         
-        # Updated style for frosted glass effect
-        self.setStyleSheet("""
-            QDialog {
-                border-radius: 15px;
-                background-color: rgba(255, 255, 255, 0.92);
-            }
-            
-            #titleBar {
-                background-color: transparent;
-                border-top-left-radius: 15px;
-                border-top-right-radius: 15px;
-            }
-            
-            /* Custom title bar styling */
-            #closeButton, #minimizeButton {
-                background-color: transparent;
-                border: none;
-                border-radius: 10px;
-                min-width: 20px;
-                min-height: 20px;
-                padding: 4px;
-                color: #2c3e50;
-                font-size: 16px;
-            }
-            
-            #closeButton:hover {
-                background-color: rgba(255, 0, 0, 0.7);
-                color: white;
-            }
-            
-            #minimizeButton:hover {
-                background-color: rgba(128, 128, 128, 0.3);
-                color: white;
-            }
-            
-            QLabel {
-                color: #2c3e50;
-                font-size: 12px;
-            }
-            QPushButton {
-                background-color: #3498db;
-                border: none;
-                color: white;
-                padding: 8px 16px;
-                border-radius: 5px;
-                font-size: 12px;
-                min-width: 80px;
-                margin: 5px;
-            }
-            QPushButton:hover {
-                background-color: #2980b9;
-            }
-            QPushButton:pressed {
-                background-color: #2473a7;
-            }
-            QPushButton:disabled {
-                background-color: #bdc3c7;
-            }
-            QSlider {
-                margin: 10px;
-            }
-            QSlider::groove:horizontal {
-                border: 1px solid #bdc3c7;
-                height: 8px;
-                background: #e0e0e0;
-                margin: 2px 0;
-                border-radius: 4px;
-            }
-            QSlider::handle:horizontal {
-                background: #FA8E24;  /* Changed from #3498db to #FA8E24 */
-                border: none;
-                width: 18px;
-                margin: -5px 0;
-                border-radius: 9px;
-            }
-            QSlider::handle:horizontal:hover {
-                background: #DD7714;  /* Darker version of #FA8E24 for hover state */
-            }
-            QCheckBox {
-                color: #2c3e50;
-                font-size: 12px;
-                padding: 5px;
-            }
-            QCheckBox::indicator {
-                width: 18px;
-                height: 18px;
-                border-radius: 3px;
-            }
-            QCheckBox::indicator:unchecked {
-                border: 2px solid #bdc3c7;
-            }
-            QCheckBox::indicator:checked {
-                background-color: #3498db;
-                border: 2px solid #3498db;
-            }
-            
-            #startButton {
-                background-color: #FA8E24;
-                border: none;
-                color: black;
-                padding: 0px;
-                border-radius: 16px;
-                font-size: 14px;
-                min-width: 360px;
-                width: 360px;
-                max-width: 360px;
-                height: 64px;          /* Doubled from 32px */
-                max-height: 64px;      /* Doubled from 32px */
-            }
-            
-            #startButton:hover {
-                background-color: #DD7714;
-            }
-            
-            #startButton:disabled {
-                background-color: #EDEDED;
-                color: #808080;
-            }
-        """)
-        
-        # Add animation properties
-        self.animation = SpriteAnimation(resource_path('goose.png'), resource_path('goose.json'))
+        # Frosted glass look comes from the app theme
+        self.setObjectName("selector")
+        
+        # Animation properties, loaded right after the first paint
+        self.animation = None
+        self.clock = None
         self.current_frame = None
-        self.frame_time = 0
+        self.preview_scale = None
         
-        # Add animation timer
-        self.animation_timer = QTimer()
-        self.animation_timer.timeout.connect(self.update_preview_animation)
-        self.animation_timer.start(16)  # ~60 FPS
+        # Add animation timer, armed for the end of each frame
+        self.animation_timer = FrameScheduler(self.update_preview_animation, self)
         
         self.initUI()
+        timeline.mark('selector built')
+    
+    def load_preview(self):
+        if self.animation is not None:
+            return
+        self.animation = sprite_registry.acquire(self.pack)
+        self.update_preview_scale()
+        # A screen with another pixel ratio needs another level of the frames
+        self.windowHandle().screenChanged.connect(self.update_preview_timer)
+        # The pack's first behavior state, facing right
+        behavior = self.animation.behavior
+        self.preview_animation = behavior.animations[behavior.initial][1]
+        self.clock = AnimationClock(self.animation)
+        timeline.mark('assets loaded')
+        # The preview starts once the loader threads have scaled its frames
+        asset_loader.strip_ready.connect(self.update_preview_timer)
+        asset_loader.progress.connect(self.show_progress)
+        self.update_preview_timer()
+    
+    def update_preview_scale(self):
+        # Same as DesktopPet.update_scale, the loader only keeps levels someone acquired
+        scale_key = (96, self.preview.devicePixelRatioF())
+        if scale_key != self.preview_scale:
+            if self.preview_scale is not None:
+                self.animation.release_size(*self.preview_scale)
+            self.animation.acquire_size(*scale_key)
+            self.preview_scale = scale_key
+    
+    def update_preview_timer(self):
+        if self.animation is not None:
+            self.update_preview_scale()
+        # The preview is pointless while minimized, hidden, locked or once the real pet is out
+        running = (self.animation is not None and self.isVisible() and not self.isMinimized()
+                   and self.governor.session_active and not self.engine.pets
+                   and self.animation.request_strip(self.preview_animation, *self.preview_scale) is not None)
+        if running and not self.animation_timer.isActive():
+            self.animation_timer.start()
+        elif not running:
+            self.animation_timer.stop()
+    
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.governor.watch(self)
+        self.update_preview_timer()
+    
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.update_preview_timer()
+    
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() == QEvent.WindowStateChange:
+            self.update_preview_timer()
         
     def initUI(self):
         # Main layout
@@ -358,15 +1318,8 @@ class SpriteSelector(QDialog):
         preview_container.addStretch()
         
         # Preview section
-        self.preview = QLabel()
+        self.preview = SpriteView()
         self.preview.setFixedSize(96, 96)
-        self.preview.setAlignment(Qt.AlignCenter)
-        self.preview.setStyleSheet("""
-            QLabel {
-                background-color: transparent;
-                border: none;
-            }
-        """)
         preview_container.addWidget(self.preview)
         preview_container.addStretch()
         content_layout.addLayout(preview_container)
@@ -377,19 +1330,7 @@ class SpriteSelector(QDialog):
         # Container for hydration settings
         hydration_container = QWidget()
         hydration_container.setFixedWidth(360)
-        hydration_container.setStyleSheet("""
-            QWidget {
-                border: 0.5px solid rgba(0, 0, 0, 0.65);
-                border-radius: 16px;
-                padding: 6px;
-            }
-            QLabel {
-                border: none;
-            }
-            QSlider {
-                border: none;
-            }
-        """)
+        hydration_container.setProperty("card", True)
         hydration_container_layout = QVBoxLayout(hydration_container)
         hydration_container_layout.setContentsMargins(6, 12, 6, 0)  # Removed bottom padding
         hydration_container_layout.setSpacing(2)  # Minimal spacing between toggle and interval
@@ -398,13 +1339,6 @@ class SpriteSelector(QDialog):
         hydration_layout = QHBoxLayout()
         hydration_layout.setSpacing(4)
         hydration_label = QLabel("Hydration reminder")
-        hydration_label.setStyleSheet("""
-            QLabel {
-                color: #2c3e50;
-                font-size: 12px;
-                border: none;
-            }
-        """)
         self.hydration_checkbox = ToggleSwitch()
         hydration_layout.addWidget(hydration_label)
         hydration_layout.addWidget(self.hydration_checkbox)
@@ -416,7 +1350,6 @@ class SpriteSelector(QDialog):
         timer_layout.setSpacing(4)
         timer_layout.setContentsMargins(0, 0, 0, 0)
         timer_label = QLabel("Reminder interval:")
-        timer_label.setStyleSheet("border: none;")
         self.timer_slider = QSlider(Qt.Horizontal)
         self.timer_slider.setFixedWidth(150)  # Set fixed width for slider
         self.timer_slider.setMinimum(300)  # 5 minutes in seconds
@@ -425,7 +1358,6 @@ class SpriteSelector(QDialog):
         self.timer_slider.setPageStep(300)  # Page step of 5 minutes
         self.timer_slider.setValue(1200)
         self.timer_display = QLabel("20 minutes")
-        self.timer_display.setStyleSheet("border: none;")
         self.timer_display.setFixedWidth(80)  # Set fixed width for display label
         self.timer_slider.valueChanged.connect(self.update_timer_display)
         
@@ -440,19 +1372,7 @@ class SpriteSelector(QDialog):
         # Container for posture settings
         posture_container = QWidget()
         posture_container.setFixedWidth(360)
-        posture_container.setStyleSheet("""
-            QWidget {
-                border: 0.5px solid rgba(0, 0, 0, 0.65);
-                border-radius: 16px;
-                padding: 6px;
-            }
-            QLabel {
-                border: none;
-            }
-            QSlider {
-                border: none;
-            }
-        """)
+        posture_container.setProperty("card", True)
         posture_container_layout = QVBoxLayout(posture_container)
         posture_container_layout.setContentsMargins(6, 12, 6, 0)  # Removed bottom padding
         posture_container_layout.setSpacing(2)  # Minimal spacing between toggle and interval
@@ -461,13 +1381,6 @@ class SpriteSelector(QDialog):
         posture_layout = QHBoxLayout()
         posture_layout.setSpacing(4)
         posture_label = QLabel("Posture check")
-        posture_label.setStyleSheet("""
-            QLabel {
-                color: #2c3e50;
-                font-size: 12px;
-                border: none;
-            }
-        """)
         self.posture_checkbox = ToggleSwitch()
         posture_layout.addWidget(posture_label)
         posture_layout.addWidget(self.posture_checkbox)
@@ -479,7 +1392,6 @@ class SpriteSelector(QDialog):
         posture_timer_layout.setSpacing(4)
         posture_timer_layout.setContentsMargins(0, 0, 0, 0)
         posture_timer_label = QLabel("Reminder interval:")
-        posture_timer_label.setStyleSheet("border: none;")
         self.posture_timer_slider = QSlider(Qt.Horizontal)
         self.posture_timer_slider.setFixedWidth(150)  # Set fixed width for slider
         self.posture_timer_slider.setMinimum(300)  # 5 minutes in seconds
@@ -488,7 +1400,6 @@ class SpriteSelector(QDialog):
         self.posture_timer_slider.setPageStep(300)  # Page step of 5 minutes
         self.posture_timer_slider.setValue(1200)
         self.posture_timer_display = QLabel("20 minutes")
-        self.posture_timer_display.setStyleSheet("border: none;")
         self.posture_timer_display.setFixedWidth(80)  # Set fixed width for display label
         self.posture_timer_slider.valueChanged.connect(self.update_posture_timer_display)
         
@@ -548,70 +1459,598 @@ class SpriteSelector(QDialog):
         painter.setRenderHint(QPainter.Antialiasing)
         
         # Draw the background with opacity and border
-        painter.setBrush(QColor(255, 255, 255, 245))  # White at 96% opacity (245/255)
+        painter.setBrush(QColor(PALETTE['panel']))
         pen = painter.pen()
         pen.setWidth(1)  # Set border width to 1px
-        pen.setColor(QColor(0, 0, 0, 127))  # Semi-transparent black for the border
+        pen.setColor(QColor(PALETTE['panel_border']))
         painter.setPen(pen)
         painter.drawRoundedRect(self.rect(), 20, 20)
+        
+        if self.animation is None:
+            # Dialog is on screen now, fetch the sprites for the preview
+            timeline.mark('selector painted')
+            QTimer.singleShot(0, self.load_preview)
 
-    def update_preview_animation(self):
-        if self.current_frame is None or self.frame_time <= 0:
-            self.current_frame, duration = next(self.animation.frame_cycles['idle-right'])
-            self.frame_time = duration
-            scaled_frame = self.current_frame.scaled(
-                96, 96,  # Preview box size (reduced from 128)
-                Qt.KeepAspectRatio,
-                Qt.SmoothTransformation
-            )
-            self.preview.setPixmap(scaled_frame)
-        self.frame_time -= 16
+    def update_preview_animation(self, now):
+        if self.current_frame is None:
+            timeline.mark('first preview frame')
+        self.current_frame, remaining = self.clock.frame(self.preview_animation, now)
+        # Preview box size (reduced from 128)
+        self.update_preview_scale()
+        sheet, source, target, _, mirrored = self.animation.strip(self.preview_animation, *self.preview_scale)[self.current_frame]
+        self.preview.set_frame(sheet, source, target, mirrored)
+        return remaining
 
     def toggle_pet(self):
-        if self.pet is None:
+        if not self.engine.pets:
             # Create and show the pet
-            self.pet = DesktopPet(
-                96,  # Fixed size to match preview
-                850,  # travel range increased to 850px
-                self.hydration_checkbox.isChecked(),
-                self.timer_slider.value(),
-                self.posture_checkbox.isChecked(),
-                self.posture_timer_slider.value()
+            self.engine.spawn(
+                1,
+                sprite_size=self.sprite_size,  # Same as the preview, pets are resized from their menu
+                max_travel=850,  # travel range increased to 850px
+                pack=self.pack,
+                hydration_enabled=self.hydration_checkbox.isChecked(),
+                hydration_interval=self.timer_slider.value(),
+                posture_enabled=self.posture_checkbox.isChecked(),
+                posture_interval=self.posture_timer_slider.value()
             )
-            self.start_btn.setText("Stop deskpet")
         else:
-            # Close the pet
-            self.pet.close()
-            self.pet = None
-            self.start_btn.setText("Start deskpet")
+            # Close every pet
+            self.engine.despawn_all()
+    
+    def update_start_button(self, count):
+        self.start_btn.setText("Stop deskpet" if count else "Start deskpet")
+    
+    def show_progress(self, done, total):
+        if done < total:
+            self.start_btn.setText(f"Loading animations {done}/{total}")
+        else:
+            self.update_start_button(len(self.engine.pets))
 
     def update_posture_timer_display(self, value):
         minutes = value // 60
         self.posture_timer_display.setText(f"{minutes} minutes")
 
+class SpatialHash:
+    """ Uniform grid of pet slots, so only pets in the same or touching cells are compared """
+    # Cells to the right and below, looking at half the neighbourhood yields every pair once
+    FORWARD = ((1, -1), (1, 0), (1, 1), (0, 1))
+    
+    def __init__(self):
+        self.cell_size = 1.0
+        self.cells = {}
+    
+    def rebuild(self, cell_size, slots, xs, ys):
+        # Anything closer than cell_size ends up in the same or a touching cell
+        self.cell_size = cell_size
+        self.cells = {}
+        for slot, x, y in zip(slots, xs, ys):
+            self.cells.setdefault((int(x // cell_size), int(y // cell_size)), []).append(slot)
+    
+    def pairs(self):
+        """ Candidate pairs of nearby slots, each pair once """
+        for (cx, cy), slots in self.cells.items():
+            for index, a in enumerate(slots):
+                for b in slots[index + 1:]:
+                    yield a, b
+            for dx, dy in self.FORWARD:
+                neighbours = self.cells.get((cx + dx, cy + dy))
+                if neighbours:
+                    for a in slots:
+                        for b in neighbours:
+                            yield a, b
+
+class PetSimulation:
+    """ Struct-of-arrays state for every pet, advanced in batches with a fixed timestep """
+    MOVING = 1
+    DRAGGING = 2
+    AIRBORNE = 4
+    CHASING = 8           # walking towards the cursor instead of back and forth
+    DT = 0.01             # seconds per physics step
+    MAX_CATCH_UP = 0.25   # longest stretch simulated at once, e.g. after a stall
+    WALK_SPEED = 40.0     # px/s, the old 2 px per 50 ms tick
+    GRAVITY = 2400.0      # px/s²
+    BOUNCE = 0.4          # share of horizontal speed kept when hitting a screen edge
+    PERSONAL_SPACE = 0.6  # walking pets turn around when another pet's middle is closer than this many sizes
+    # Pets it takes for NumPy's per-call overhead to pay off, plain lists are far cheaper for a few.
+    # Below half of it the state goes back to lists, so a population around the mark doesn't flip-flop.
+    VECTORIZE_AT = 32
+    FLOAT_FIELDS = ('x', 'y', 'prev_x', 'prev_y', 'vx', 'vy', 'start_x', 'min_x', 'max_x', 'min_y', 'floor', 'size')
+    INT_FIELDS = ('direction', 'max_travel', 'state', 'frame', 'behavior')
+    
+    def __init__(self, capacity=16, seed=None):
+        load_numpy()
+        # Decisions only draw from these, the same seed makes the same pets
+        self.random = random.Random(seed)
+        self.rng = np.random.default_rng(seed) if np else None
+        self.vectorized = False  # state in NumPy arrays instead of lists, see vectorize()
+        self.capacity = 0
+        self.count = 0  # slots ever handed out, free ones are reused first
+        self.free = []
+        self.clock = None  # monotonic time simulated up to
+        self.accumulator = 0.0
+        self.neighbours = SpatialHash()
+        self.cursor_x = None  # where chasing pets head, updated by the engine
+        # Behavior states of every pack in one set of tables, see add_behavior()
+        self.behaviors = {}
+        self.behavior_states = []
+        self.tables = {}
+        self.grow(capacity)
+    
+    def grow(self, capacity):
+        for fields, kind in ((self.FLOAT_FIELDS, float), (self.INT_FIELDS, int)):
+            for field in fields:
+                old = getattr(self, field, None)
+                if self.vectorized:
+                    new = np.zeros(capacity, dtype=np.float64 if kind is float else np.int64)
+                    if old is not None:
+                        new[:len(old)] = old
+                else:
+                    new = (old or []) + [kind()] * (capacity - self.capacity)
+                setattr(self, field, new)
+        self.capacity = capacity
+    
+    def vectorize(self, vectorized):
+        """ Move the state between plain lists and NumPy arrays, the batch paths follow it """
+        if vectorized == self.vectorized or (vectorized and not np):
+            return
+        for fields, dtype in ((self.FLOAT_FIELDS, 'float64'), (self.INT_FIELDS, 'int64')):
+            for field in fields:
+                old = getattr(self, field)
+                setattr(self, field, np.array(old, dtype=dtype) if vectorized else old.tolist())
+        self.vectorized = vectorized
+        self.set_tables()
+    
+    def population(self):
+        return self.count - len(self.free)
+    
+    def add(self, x, y, max_travel, size):
+        if self.free:
+            slot = self.free.pop()
+        else:
+            if self.count == self.capacity:
+                self.grow(self.capacity * 2)
+            slot = self.count
+            self.count += 1
+        self.place(slot, x, y)
+        self.vx[slot] = self.vy[slot] = 0.0
+        self.direction[slot] = 1
+        self.start_x[slot] = x
+        self.max_travel[slot] = max_travel
+        self.size[slot] = size
+        self.set_bounds(slot, float('-inf'), float('inf'), float('-inf'), float('inf'))
+        self.state[slot] = 0
+        self.frame[slot] = 0
+        if self.population() >= self.VECTORIZE_AT:
+            self.vectorize(True)
+        return slot
+    
+    def add_behavior(self, behavior):
+        """ Append a pack's compiled states to the shared tables, once, and return the index of its first state """
+        offset = self.behaviors.get(behavior)
+        if offset is not None:
+            return offset
+        offset = self.behaviors[behavior] = len(self.behavior_states)
+        for state in range(len(behavior.names)):
+            self.behavior_states.append((behavior.motion[state], behavior.shortest[state], behavior.longest[state],
+                                         [offset + column for column in range(len(behavior.names))],
+                                         behavior.threshold[state],
+                                         [offset + column for column in behavior.alias[state]]))
+        
+        # Rows are padded to the widest pack, each state only ever draws from its own columns
+        width = max(len(outcome) for _, _, _, outcome, _, _ in self.behavior_states)
+        self.tables = tables = {'motion': [], 'shortest': [], 'longest': [], 'choices': [], 'outcome': [], 'threshold': [], 'alias': []}
+        for motion, shortest, longest, outcome, threshold, alias in self.behavior_states:
+            padding = width - len(outcome)
+            tables['motion'].append(motion)
+            tables['shortest'].append(shortest)
+            tables['longest'].append(longest)
+            tables['choices'].append(len(outcome))
+            tables['outcome'].append(outcome + [outcome[0]] * padding)
+            tables['threshold'].append(threshold + [1.0] * padding)
+            tables['alias'].append(alias + [alias[0]] * padding)
+        self.set_tables()
+        return offset
+    
+    def set_tables(self):
+        for name, table in self.tables.items():
+            setattr(self, name, np.array(table) if self.vectorized else table)
+    
+    def enter(self, slots, states):
+        """ Switch pets to behavior states, keeping drag and flight """
+        if not self.vectorized:
+            for slot, state in zip(slots, states):
+                self.behavior[slot] = state
+                self.state[slot] = (self.state[slot] & ~(self.MOVING | self.CHASING)) | self.motion[state]
+            return
+        self.behavior[slots] = states
+        self.state[slots] = (self.state[slots] & ~(self.MOVING | self.CHASING)) | self.motion[states]
+    
+    def remove(self, slot):
+        # A free slot is neither walking nor airborne, so batch steps skip it
+        self.state[slot] = 0
+        self.free.append(slot)
+        if self.population() < self.VECTORIZE_AT // 2:
+            self.vectorize(False)
+    
+    def place(self, slot, x, y):
+        """ Put a pet somewhere directly, without interpolating from where it was """
+        self.x[slot] = self.prev_x[slot] = x
+        self.y[slot] = self.prev_y[slot] = y
+    
+    def set_bounds(self, slot, min_x, max_x, min_y, floor):
+        """ Screen limits for the pet's top-left corner """
+        self.min_x[slot] = min_x
+        self.max_x[slot] = max_x
+        self.min_y[slot] = min_y
+        self.floor[slot] = floor
+    
+    def throw(self, slot, vx, vy):
+        self.vx[slot] = vx
+        self.vy[slot] = vy
+        self.state[slot] |= self.AIRBORNE
+    
+    def sync_clock(self, now):
+        """ Start simulating from `now`, dropping time nobody was moving in """
+        self.clock = now
+        self.accumulator = 0.0
+    
+    def advance(self, now):
+        """ Run the fixed steps that fit up to `now`, return the moved slots and the interpolation factor """
+        if self.clock is None:
+            self.clock = now
+        self.accumulator += min(now - self.clock, self.MAX_CATCH_UP)
+        self.clock = now
+        moved = set()
+        while self.accumulator >= self.DT:
+            moved.update(self.step(self.DT))
+            self.accumulator -= self.DT
+        return sorted(moved), self.accumulator / self.DT
+    
+    def render(self, slots, alpha):
+        """ Whole-pixel positions between the last two steps, for drawing """
+        if not self.vectorized:
+            return [(slot,
+                     round(self.prev_x[slot] + (self.x[slot] - self.prev_x[slot]) * alpha),
+                     round(self.prev_y[slot] + (self.y[slot] - self.prev_y[slot]) * alpha))
+                    for slot in slots]
+        index = np.asarray(slots, dtype=np.int64)
+        x = np.rint(self.prev_x[index] + (self.x[index] - self.prev_x[index]) * alpha).astype(np.int64)
+        y = np.rint(self.prev_y[index] + (self.y[index] - self.prev_y[index]) * alpha).astype(np.int64)
+        return list(zip(index.tolist(), x.tolist(), y.tolist()))
+    
+    def step(self, dt, slots=None):
+        """ Advance walking and airborne pets by dt seconds and return the slots that moved """
+        if not self.vectorized:
+            return self.step_slots(dt, range(self.count) if slots is None else slots)
+        
+        index = np.arange(self.count) if slots is None else np.asarray(slots, dtype=np.int64)
+        state = self.state[index]
+        walking = index[(state & ~self.CHASING) == self.MOVING]
+        flying = index[(state & (self.AIRBORNE | self.DRAGGING)) == self.AIRBORNE]
+        
+        # Walk, then clamp to the travel range within the screen and turn around at either end.
+        # Chasing pets head for the cursor instead and only stop at the screen edges.
+        self.prev_x[walking] = x = self.x[walking]
+        self.prev_y[walking] = self.y[walking]
+        half = self.max_travel[walking] // 2
+        low = np.maximum(self.start_x[walking] - half, self.min_x[walking])
+        high = np.minimum(self.start_x[walking] + half, self.max_x[walking])
+        speed = self.WALK_SPEED * dt
+        chasing = (self.state[walking] & self.CHASING) != 0
+        if chasing.any():
+            if self.cursor_x is not None:
+                gap = self.cursor_x - (x + self.size[walking] / 2)
+                self.direction[walking] = np.where(chasing & (gap != 0), np.sign(gap), self.direction[walking])
+                speed = np.where(chasing, np.minimum(speed, np.abs(gap)), speed)
+            low = np.where(chasing, self.min_x[walking], low)
+            high = np.where(chasing, self.max_x[walking], high)
+        x = x + speed * self.direction[walking]
+        past_right = x > high
+        past_left = x < low
+        self.x[walking] = np.minimum(np.maximum(x, low), high)
+        self.direction[walking] = np.where(past_right, -1, np.where(past_left, 1, self.direction[walking]))
+        
+        # Fall, bouncing off the screen sides until the pet lands on the floor
+        self.prev_x[flying] = self.x[flying]
+        self.prev_y[flying] = self.y[flying]
+        vx = self.vx[flying]
+        vy = self.vy[flying] + self.GRAVITY * dt
+        x = self.x[flying] + vx * dt
+        y = self.y[flying] + vy * dt
+        min_x = self.min_x[flying]
+        max_x = self.max_x[flying]
+        vx = np.where((x < min_x) | (x > max_x), -vx * self.BOUNCE, vx)
+        x = np.minimum(np.maximum(x, min_x), max_x)
+        # The top of the screen stops the climb, the floor ends the fall
+        vy = np.where(y < self.min_y[flying], 0.0, vy)
+        y = np.maximum(y, self.min_y[flying])
+        landed = y >= self.floor[flying]
+        y = np.minimum(y, self.floor[flying])
+        self.x[flying] = x
+        self.y[flying] = y
+        self.vx[flying] = np.where(landed, 0.0, vx)
+        self.vy[flying] = np.where(landed, 0.0, vy)
+        self.direction[flying] = np.where(vx > 0, 1, np.where(vx < 0, -1, self.direction[flying]))
+        
+        # Walk on from wherever the pet came down
+        down = flying[landed]
+        self.state[down] &= ~self.AIRBORNE
+        self.start_x[down] = self.prev_x[down] = self.x[down]
+        self.prev_y[down] = self.y[down]
+        return np.concatenate((walking, flying)).tolist()
+    
+    def step_slots(self, dt, slots):
+        # Plain Python version of step() for a few pets or when NumPy is missing
+        moved = []
+        for slot in slots:
+            state = self.state[slot]
+            if state & ~self.CHASING == self.MOVING:
+                self.prev_x[slot] = self.x[slot]
+                self.prev_y[slot] = self.y[slot]
+                speed = self.WALK_SPEED * dt
+                if state & self.CHASING:
+                    low, high = self.min_x[slot], self.max_x[slot]
+                    if self.cursor_x is not None:
+                        gap = self.cursor_x - (self.x[slot] + self.size[slot] / 2)
+                        if gap:
+                            self.direction[slot] = 1 if gap > 0 else -1
+                        speed = min(speed, abs(gap))
+                else:
+                    half = self.max_travel[slot] // 2
+                    low = max(self.start_x[slot] - half, self.min_x[slot])
+                    high = min(self.start_x[slot] + half, self.max_x[slot])
+                x = self.x[slot] + speed * self.direction[slot]
+                if x > high:
+                    self.direction[slot] = -1
+                elif x < low:
+                    self.direction[slot] = 1
+                self.x[slot] = min(max(x, low), high)
+                moved.append(slot)
+            elif state & (self.AIRBORNE | self.DRAGGING) == self.AIRBORNE:
+                self.prev_x[slot] = self.x[slot]
+                self.prev_y[slot] = self.y[slot]
+                self.vy[slot] += self.GRAVITY * dt
+                x = self.x[slot] + self.vx[slot] * dt
+                y = self.y[slot] + self.vy[slot] * dt
+                if x < self.min_x[slot] or x > self.max_x[slot]:
+                    self.vx[slot] = -self.vx[slot] * self.BOUNCE
+                if self.vx[slot]:
+                    self.direction[slot] = 1 if self.vx[slot] > 0 else -1
+                self.x[slot] = min(max(x, self.min_x[slot]), self.max_x[slot])
+                if y < self.min_y[slot]:
+                    y = self.min_y[slot]
+                    self.vy[slot] = 0.0
+                if y >= self.floor[slot]:
+                    self.vx[slot] = self.vy[slot] = 0.0
+                    self.state[slot] = state & ~self.AIRBORNE
+                    self.start_x[slot] = self.x[slot]
+                    self.place(slot, self.x[slot], self.floor[slot])
+                else:
+                    self.y[slot] = y
+                moved.append(slot)
+        return moved
+    
+    def interact(self):
+        """ Turn walking pets around when they run into another pet on the ground, returns the slots that turned """
+        if self.vectorized:
+            grounded = np.flatnonzero((self.state[:self.count] & (self.AIRBORNE | self.DRAGGING)) == 0)
+            slots = np.setdiff1d(grounded, self.free).tolist()
+            if not slots or not (self.state[slots] & self.MOVING).any():
+                return []
+            sizes = self.size[slots].tolist()
+            xs = (self.x[slots] + self.size[slots] / 2).tolist()
+            ys = (self.y[slots] + self.size[slots] / 2).tolist()
+            heading = np.where(self.state[slots] == self.MOVING, self.direction[slots], 0).tolist()
+        else:
+            free = set(self.free)
+            slots = [slot for slot in range(self.count)
+                     if slot not in free and not self.state[slot] & (self.AIRBORNE | self.DRAGGING)]
+            if not any(self.state[slot] & self.MOVING for slot in slots):
+                return []
+            sizes = [self.size[slot] for slot in slots]
+            xs = [self.x[slot] + self.size[slot] / 2 for slot in slots]
+            ys = [self.y[slot] + self.size[slot] / 2 for slot in slots]
+            heading = [self.direction[slot] if self.state[slot] == self.MOVING else 0 for slot in slots]
+        
+        # Pets closer than the biggest one's size share a cell or touch one, which covers any meeting
+        self.neighbours.rebuild(max(sizes), slots, xs, ys)
+        # Plain lists from here on, indexing arrays one pet at a time is what would make this slow
+        pets = dict(zip(slots, zip(xs, ys, sizes, heading)))
+        turned = set()
+        for a, b in self.neighbours.pairs():
+            ax, ay, a_size, a_heading = pets[a]
+            bx, by, b_size, b_heading = pets[b]
+            dx = bx - ax
+            if abs(dx) >= (a_size + b_size) / 2 * self.PERSONAL_SPACE or abs(by - ay) >= min(a_size, b_size) / 2:
+                continue
+            # Only a pet walking into the other one turns, so pets that met walk apart
+            if dx * a_heading > 0:
+                turned.add(a)
+            if dx * b_heading < 0:
+                turned.add(b)
+        for slot in turned:
+            self.direction[slot] = -self.direction[slot]
+        return sorted(turned)
+    
+    def decide(self, slots):
+        """ Move each slot on to its next behavior state and return how many seconds it lasts.
+        
+        A weighted pick in constant time per pet whatever the number of states: a random column of the
+        state's alias table (Vose), kept below its threshold and swapped for its alias above.
+        """
+        if not self.vectorized:
+            durations = []
+            for slot in slots:
+                current = self.behavior[slot]
+                column = int(self.random.random() * self.choices[current])
+                if self.random.random() < self.threshold[current][column]:
+                    chosen = self.outcome[current][column]
+                else:
+                    chosen = self.alias[current][column]
+                self.enter([slot], [chosen])
+                durations.append(self.shortest[chosen] + self.random.random() * (self.longest[chosen] - self.shortest[chosen]))
+                self.prev_x[slot] = self.x[slot]
+            return durations
+        index = np.asarray(slots, dtype=np.int64)
+        current = self.behavior[index]
+        column = (self.rng.random(len(index)) * self.choices[current]).astype(np.int64)
+        kept = self.rng.random(len(index)) < self.threshold[current, column]
+        chosen = np.where(kept, self.outcome[current, column], self.alias[current, column])
+        self.enter(index, chosen)
+        durations = self.shortest[chosen] + self.rng.random(len(index)) * (self.longest[chosen] - self.shortest[chosen])
+        # Pets that stop should be drawn exactly where they stopped
+        self.prev_x[index] = self.x[index]
+        return durations.tolist()
+
+# Used for packs whose manifest has no "behavior", the original walk or idle coin flip every 3 s
+DEFAULT_BEHAVIOR = {
+    'initial': 'idle',
+    'states': {
+        'idle': {'animation': 'idle', 'duration': 3, 'next': {'idle': 1, 'walk': 1}},
+        'walk': {'animation': 'walking', 'motion': 'walk', 'duration': 3, 'next': {'idle': 1, 'walk': 1}},
+    },
+}
+
+class Behavior:
+    """ Behavior states of a pack compiled into flat per-state tables, evaluated by PetSimulation.decide().
+    
+    The manifest's "behavior" is {"initial": state, "falling": animation, "states": {name: state}}, each state
+    {"animation": name, "motion": "idle" | "walk" | "chase", "duration": seconds or [shortest, longest],
+     "still": true to hold the current frame, "next": {state: weight}}.
+    An animation name picks "<name>-right" and "<name>-left" when the pack has both.
+    """
+    MOTIONS = {
+        'idle': 0,
+        'walk': PetSimulation.MOVING,
+        'chase': PetSimulation.MOVING | PetSimulation.CHASING,
+    }
+    
+    def __init__(self, spec, animations):
+        states = spec['states']
+        self.names = list(states)
+        index = {name: state for state, name in enumerate(self.names)}
+        self.initial = index[spec.get('initial', self.names[0])]
+        self.falling = self.facings(spec.get('falling', 'idle'), animations)
+        
+        self.animations = []
+        self.motion = []
+        self.shortest = []
+        self.longest = []
+        self.still = []
+        self.threshold = []
+        self.alias = []
+        for name in self.names:
+            state = states[name]
+            self.animations.append(self.facings(state['animation'], animations))
+            self.motion.append(self.MOTIONS[state.get('motion', 'idle')])
+            duration = state.get('duration', 3)
+            shortest, longest = duration if isinstance(duration, list) else (duration, duration)
+            self.shortest.append(float(shortest))
+            self.longest.append(float(longest))
+            self.still.append(bool(state.get('still', False)))
+            weights = [0.0] * len(self.names)
+            for target, weight in state['next'].items():
+                if target not in index:
+                    raise ValueError(f"behavior state {name!r} goes to unknown state {target!r}")
+                weights[index[target]] = float(weight)
+            threshold, alias = self.alias_table(weights)
+            self.threshold.append(threshold)
+            self.alias.append(alias)
+    
+    @staticmethod
+    def facings(name, animations):
+        """ (left, right) animation names, so a pet's facing indexes straight into it """
+        if f"{name}-left" in animations and f"{name}-right" in animations:
+            return f"{name}-left", f"{name}-right"
+        if name in animations:
+            return name, name
+        raise ValueError(f"behavior uses missing animation {name!r}")
+    
+    @staticmethod
+    def alias_table(weights):
+        """ Vose's alias method: column k is kept with probability threshold[k], otherwise alias[k] is taken """
+        total = sum(weights)
+        if total <= 0:
+            raise ValueError("behavior state has no next state")
+        scaled = [weight * len(weights) / total for weight in weights]
+        threshold = [1.0] * len(weights)
+        alias = list(range(len(weights)))
+        small = [column for column, share in enumerate(scaled) if share < 1.0]
+        large = [column for column, share in enumerate(scaled) if share >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            threshold[less] = scaled[less]
+            alias[less] = more
+            scaled[more] -= 1.0 - scaled[less]
+            (small if scaled[more] < 1.0 else large).append(more)
+        return threshold, alias
+
+def simulated(field):
+    """ Attribute stored in the pet's slot of the engine's PetSimulation """
+    def getter(self):
+        return int(round(float(getattr(self.engine.simulation, field)[self.slot])))
+    
+    def setter(self, value):
+        getattr(self.engine.simulation, field)[self.slot] = value
+    return property(getter, setter)
+
+def simulated_flag(flag):
+    def getter(self):
+        return bool(self.engine.simulation.state[self.slot] & flag)
+    
+    def setter(self, value):
+        state = self.engine.simulation.state
+        state[self.slot] = (state[self.slot] | flag) if value else (state[self.slot] & ~flag)
+    return property(getter, setter)
+
 class DesktopPet(QMainWindow):
-    def __init__(self, sprite_size, max_travel, hydration_enabled=False, hydration_interval=300, posture_enabled=False, posture_interval=300):
+    # Simulation state lives in the engine's PetSimulation, the widget only renders it
+    x = simulated('x')
+    y = simulated('y')
+    direction = simulated('direction')
+    start_x = simulated('start_x')
+    max_travel = simulated('max_travel')
+    current_frame = simulated('frame')
+    is_moving = simulated_flag(PetSimulation.MOVING)
+    is_dragging = simulated_flag(PetSimulation.DRAGGING)
+    is_airborne = simulated_flag(PetSimulation.AIRBORNE)
+    
+    # Releasing faster than this throws the pet, px/s
+    FLING_SPEED = 400
+    MAX_FLING_SPEED = 2500
+    
+    # Offered in the context menu
+    SIZES = (48, 64, 96, 128, 192)
+    
+    def __init__(self, engine, sprite_size, max_travel, pack=None, x=500, y=500):
         super().__init__()
+        self.engine = engine
         self.sprite_size = sprite_size
-        self.max_travel = max_travel
-        self.hydration_enabled = hydration_enabled
-        self.hydration_interval = hydration_interval
-        self.posture_enabled = posture_enabled
-        self.posture_interval = posture_interval
-        self.start_x = None
-        self.reminder_window = ReminderWindow()
-        self.posture_reminder_window = ReminderWindow("Posture")
+        self.pack = pack or resource_path(DEFAULT_PACK)
         
         # Load animations
-        self.animation = SpriteAnimation(resource_path('goose.png'), resource_path('goose.json'))
-        self.current_animation = 'idle-right'
-        self.current_frame = None
-        self.frame_time = 0
+        self.animation = sprite_registry.acquire(self.pack)
+        self.clock = AnimationClock(self.animation, engine.now())
+        
+        # Behavior states of the pack are shared by every pet in the simulation's tables
+        behavior = self.animation.behavior
+        self.slot = engine.simulation.add(x, y, max_travel, sprite_size)
+        self.behavior_offset = engine.simulation.add_behavior(behavior)
+        engine.simulation.enter([self.slot], [self.behavior_offset + behavior.initial])
+        self.current_animation = behavior.animations[behavior.initial][1]
+        self.shown_animation = None
+        # Current frame as a rect of the animation's shared strip pixmap
+        self.frame_sheet = None
+        self.frame_source = None
+        self.frame_target = None
+        self.frame_mirrored = False
+        self.frame_mask = None
+        self.scale_key = None
         
-        # Add animation timer
-        self.animation_timer = QTimer()
-        self.animation_timer.timeout.connect(self.update_animation)
-        self.animation_timer.start(16)  # ~60 FPS
+        # Deadlines on the engine's monotonic clock, advanced by the PetEngine tick
+        self.frame_deadline = engine.now()
+        self.decision_deadline = self.frame_deadline + PetEngine.DECISION_INTERVAL
         
         self.initUI()
 
@@ -619,122 +2058,1126 @@ class DesktopPet(QMainWindow):
         self.setWindowFlags(Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint | Qt.Tool)
         self.setAttribute(Qt.WA_TranslucentBackground)
         
-        self.pet = QLabel(self)
+        self.pet = SpriteView(self)
         self.pet.setGeometry(0, 0, self.sprite_size, self.sprite_size)
         
-        self.x = 500
-        self.y = 500
-        self.direction = 1
-        self.is_moving = False
-        self.is_dragging = False
         self.drag_offset = None
         
-        self.move_timer = QTimer(self)
-        self.move_timer.timeout.connect(self.update_position)
-        self.move_timer.start(50)
-        
-        self.decision_timer = QTimer(self)
-        self.decision_timer.timeout.connect(self.make_decision)
-        self.decision_timer.start(3000)
-        
-        if self.hydration_enabled:
-            self.hydration_timer = QTimer(self)
-            self.hydration_timer.timeout.connect(self.hydration_check)
-            self.hydration_timer.start(self.hydration_interval * 1000)
-        
-        if self.posture_enabled:
-            self.posture_timer = QTimer(self)
-            self.posture_timer.timeout.connect(self.posture_check)
-            self.posture_timer.start(self.posture_interval * 1000)
-        
         self.setGeometry(self.x, self.y, self.sprite_size, self.sprite_size)
-        self.show()
+        if not self.engine.overlay_mode:
+            self.show()
         
-        if self.start_x is None:
-            self.start_x = self.x
+        self.drawn_rect = self.geometry_rect()
+        self.drag_trail = []
     
-    def hydration_check(self):
-        self.reminder_window.show()
-        self.reminder_window.raise_()
-        self.reminder_window.activateWindow()
-    
-    def posture_check(self):
-        self.posture_reminder_window.show()
-        self.posture_reminder_window.raise_()
-        self.posture_reminder_window.activateWindow()
-    
-    def update_animation(self):
-        if self.current_frame is None or self.frame_time <= 0:
-            self.current_frame, duration = next(self.animation.frame_cycles[self.current_animation])
-            self.frame_time = duration
-            scaled_frame = self.current_frame.scaled(
-                self.sprite_size, self.sprite_size,
-                Qt.KeepAspectRatio, Qt.SmoothTransformation
-            )
-            self.pet.setPixmap(scaled_frame)
-        self.frame_time -= 16
+    def geometry_rect(self):
+        return QRect(self.x, self.y, self.sprite_size, self.sprite_size)
     
-    def update_position(self):
-        if self.is_moving and not self.is_dragging:
-            self.x += 2 * self.direction
-            
-            # Update animation based on direction
-            self.current_animation = 'walking-right' if self.direction > 0 else 'walking-left'
-            
-            if abs(self.x - self.start_x) > self.max_travel // 2:
-                if self.x > self.start_x:
-                    self.x = self.start_x + self.max_travel // 2
-                    self.direction = -1
-                else:
-                    self.x = self.start_x - self.max_travel // 2
-                    self.direction = 1
-            
-            self.move(self.x, self.y)
+    def place(self, x, y):
+        # Only talk to the window system when the whole-pixel position changed
+        rect = QRect(x, y, self.sprite_size, self.sprite_size)
+        if rect == self.drawn_rect:
+            return
+        # In overlay mode the pet has no window of its own, the overlay repaints it
+        if self.engine.overlay_mode:
+            self.engine.invalidate(self.drawn_rect, moved=True)
+            self.engine.invalidate(rect, moved=True)
+        else:
+            self.move(x, y)
+        self.drawn_rect = rect
+    
+    def show_frame(self, sheet, source, target, mask, mirrored):
+        if self.frame_sheet is None:
+            timeline.mark('first pet frame')
+        self.frame_sheet = sheet
+        self.frame_source = source
+        self.frame_target = target
+        self.frame_mirrored = mirrored
+        # Masks are cached regions, so an unchanged mask is the very same object
+        mask_changed = mask is not self.frame_mask
+        self.frame_mask = mask
+        if self.engine.overlay_mode:
+            self.engine.invalidate(self.drawn_rect, moved=mask_changed)
+        else:
+            self.pet.set_frame(sheet, source, target, mirrored)
+            if mask_changed:
+                self.setMask(mask)
+    
+    def set_sprite_size(self, size):
+        """ Resize the pet where it stands, frames come from whichever pyramid level fits the new size """
+        if size == self.sprite_size:
+            return
+        self.engine.record(self.engine.now(), 'size', self.slot, size)
+        # Keep the feet on the same spot
+        x = self.x + (self.sprite_size - size) // 2
+        y = self.y + self.sprite_size - size
+        self.sprite_size = size
+        self.pet.setGeometry(0, 0, size, size)
+        self.engine.simulation.size[self.slot] = size
+        self.engine.simulation.place(self.slot, x, y)
+        self.engine.update_bounds(self)
+        
+        rect = self.geometry_rect()
+        if self.engine.overlay_mode:
+            self.engine.invalidate(self.drawn_rect, moved=True)
+            self.engine.invalidate(rect, moved=True)
+        else:
+            self.setGeometry(rect)
+        self.drawn_rect = rect
+        # Even a single-frame animation has to be drawn again
+        self.shown_animation = None
+        self.update_scale()
+        self.engine.refresh(self)
+    
+    def update_scale(self):
+        # Re-acquire cached frames when the pet lands on a screen with another pixel ratio
+        scale_key = (self.sprite_size, self.engine.pixel_ratio(self))
+        if scale_key != self.scale_key:
+            if self.scale_key is not None:
+                self.animation.release_size(*self.scale_key)
+            self.animation.acquire_size(*scale_key)
+            self.scale_key = scale_key
+            # Scale the other animations in the background before the pet needs them
+            self.animation.prefetch(*scale_key, first=self.current_animation)
+    
+    def on_screen(self):
+        return self.engine.overlay_mode or self.isVisible()
     
-    def make_decision(self):
-        import random
-        self.is_moving = random.choice([True, False])
-        if not self.is_moving:
-            # Set idle animation based on last direction
-            self.current_animation = 'idle-right' if self.direction > 0 else 'idle-left'
+    def needs_frames(self):
+        """ Whether the engine has to keep waking up for this pet's frames """
+        if not self.on_screen():
+            return False
+        if self.scale_key is not None and self.animation.request_strip(self.current_animation, *self.scale_key) is None:
+            # Still being scaled, the asset loader wakes the engine once it is ready
+            return False
+        # A new animation is drawn once even when its clock is paused, e.g. on entering a still state
+        if self.shown_animation != self.current_animation:
+            return True
+        # A paused clock or a single-frame animation only has to be shown once
+        return self.clock.paused_at is None and self.animation.frame_count(self.current_animation) > 1
+    
+    @instrumented('update_animation')
+    def update_animation(self, now=None):
+        """ Show the frame due at `now` and return ms until it ends """
+        if now is None:
+            now = self.engine.now()
+        self.update_scale()
+        strip = self.animation.request_strip(self.current_animation, *self.scale_key)
+        if strip is None:
+            return 0
+        previous = self.current_frame if self.shown_animation == self.current_animation else None
+        self.shown_animation = self.current_animation
+        self.current_frame, remaining = self.clock.frame(self.current_animation, now)
+        self.show_frame(*strip[self.current_frame])
+        if previous != self.current_frame:
+            self.engine.record(now, 'frame', self.slot, self.current_animation, self.current_frame)
+        if perf_stats.enabled and previous != self.current_frame:
+            perf_stats.count('frames shown')
+            if previous is not None:
+                # Frames the clock went past without them ever being on screen
+                perf_stats.count('frames dropped', (self.current_frame - previous - 1) % len(strip))
+        return remaining
+    
+    def sync_position(self, x, y):
+        self.sync_animation()
+        self.place(x, y)
+    
+    def sync_animation(self):
+        """ Animation of the pet's behavior state for the way it faces, pets in the air take the falling one """
+        behavior = self.animation.behavior
+        facing = self.direction > 0
+        if self.is_airborne or self.is_dragging:
+            self.current_animation = behavior.falling[facing]
+            self.clock.resume(self.engine.now())
+            return
+        state = int(self.engine.simulation.behavior[self.slot]) - self.behavior_offset
+        self.current_animation = behavior.animations[state][facing]
+        # A still state holds its frame and needs no frame ticks at all
+        if behavior.still[state]:
+            self.clock.pause(self.engine.now())
+        else:
+            self.clock.resume(self.engine.now())
     
     def mousePressEvent(self, event):
         if event.button() == Qt.LeftButton:
+            now = self.engine.now()
+            self.record_mouse(now, 'press', event)
+            # Catching a pet mid-air stops its fall
+            self.is_airborne = False
             self.is_dragging = True
             self.drag_offset = event.pos()
-            self.move_timer.stop()
-            self.decision_timer.stop()
+            self.drag_trail = [(now, event.globalPos())]
+            # Movement pauses by itself while dragging, decisions wait for the release
+            self.decision_deadline = None
         elif event.button() == Qt.RightButton:
             self.show_context_menu(event.globalPos())
     
     def mouseMoveEvent(self, event):
         if self.is_dragging:
+            now = self.engine.now()
+            self.record_mouse(now, 'move', event)
             new_pos = event.globalPos() - self.drag_offset
-            self.x = new_pos.x()
-            self.y = new_pos.y()
+            self.engine.simulation.place(self.slot, new_pos.x(), new_pos.y())
             self.start_x = self.x
-            self.move(self.x, self.y)
+            self.place(self.x, self.y)
+            
+            # Keep the last few samples around to know how fast the pet is let go
+            self.drag_trail.append((now, event.globalPos()))
+            while now - self.drag_trail[0][0] > 0.1:
+                self.drag_trail.pop(0)
     
     def mouseReleaseEvent(self, event):
         if event.button() == Qt.LeftButton:
+            now = self.engine.now()
+            self.record_mouse(now, 'release', event)
             self.is_dragging = False
-            self.move_timer.start()
-            self.decision_timer.start()
+            self.engine.update_bounds(self)
+            
+            (then, start), end = self.drag_trail[0], event.globalPos()
+            if now - then > 0.01:
+                vx = (end.x() - start.x()) / (now - then)
+                vy = (end.y() - start.y()) / (now - then)
+                speed = math.hypot(vx, vy)
+                if speed > self.FLING_SPEED:
+                    scale = min(1.0, self.MAX_FLING_SPEED / speed)
+                    self.engine.simulation.throw(self.slot, vx * scale, vy * scale)
+            
+            self.decision_deadline = now + PetEngine.DECISION_INTERVAL
+            self.engine.wake()
+    
+    def record_mouse(self, now, event_name, event):
+        self.engine.record(now, event_name, self.slot, event.x(), event.y(), event.globalX(), event.globalY())
     
     def mouseDoubleClickEvent(self, event):
-        self.current_animation = 'idle-right'
-        self.pet.setPixmap(self.animation.frames[self.current_animation][0])
+        # Restart the current animation from its first frame
+        self.clock.seek(0, self.engine.now())
+        self.engine.refresh(self)
+    
+    def showEvent(self, event):
+        super().showEvent(event)
+        # Frames were parked while hidden
+        self.engine.wake()
+    
+    def closeEvent(self, event):
+        self.engine.remove(self)
+        if self.animation is not None:
+            if self.scale_key is not None:
+                self.animation.release_size(*self.scale_key)
+                self.scale_key = None
+            sprite_registry.release(self.animation)
+            self.animation = None
+        super().closeEvent(event)
     
     def show_context_menu(self, position):
         menu = QMenu()
+        add_action = menu.addAction("Add pet")
+        remove_action = menu.addAction("Remove pet")
+        size_menu = menu.addMenu("Size")
+        size_actions = {}
+        for size in self.SIZES:
+            size_action = size_menu.addAction(f"{size} px")
+            size_action.setCheckable(True)
+            size_action.setChecked(size == self.sprite_size)
+            size_actions[size_action] = size
+        stats_action = menu.addAction("Stats")
+        menu.addSeparator()
         exit_action = menu.addAction("Exit")
         action = menu.exec_(position)
         
-        if action == exit_action:
+        if action == add_action:
+            self.engine.spawn(1, sprite_size=self.sprite_size, max_travel=self.max_travel, pack=self.pack)
+        elif action == remove_action:
+            self.engine.despawn(self)
+        elif action in size_actions:
+            self.set_sprite_size(size_actions[action])
+        elif action == stats_action:
+            self.engine.show_stats()
+        elif action == exit_action:
             QApplication.quit()
 
+class ScreenCache(QObject):
+    """ Geometry of every screen, read once and refreshed only when screens come, go or change """
+    changed = pyqtSignal()
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.screens = []
+        app = QApplication.instance()
+        app.screenAdded.connect(self.watch)
+        app.screenRemoved.connect(self.forget)
+        app.primaryScreenChanged.connect(self.refresh)
+        for screen in app.screens():
+            self.watch(screen)
+    
+    def watch(self, screen):
+        screen.geometryChanged.connect(self.refresh)
+        screen.availableGeometryChanged.connect(self.refresh)
+        self.refresh()
+    
+    def forget(self, screen):
+        self.refresh(removed=screen)
+    
+    def refresh(self, *_, removed=None):
+        app = QApplication.instance()
+        primary = app.primaryScreen()
+        # Primary first, it takes whatever is off every screen
+        screens = sorted((screen for screen in app.screens() if screen is not removed),
+                         key=lambda screen: screen is not primary)
+        self.screens = [(screen.geometry(), screen.availableGeometry()) for screen in screens]
+        self.changed.emit()
+    
+    def to_list(self):
+        return [[[rect.x(), rect.y(), rect.width(), rect.height()] for rect in screen] for screen in self.screens]
+    
+    def from_list(self, screens):
+        self.screens = [tuple(QRect(*rect) for rect in screen) for screen in screens]
+    
+    def available_at(self, point):
+        """ Area left by panels and task bars on the screen showing `point` """
+        for geometry, available in self.screens:
+            if geometry.contains(point):
+                return available
+        return self.screens[0][1] if self.screens else None
+
+class PetEngine(QObject):
+    """ Owns every live pet and advances animation, movement and decisions from one timer """
+    MOVE_INTERVAL = 0.05  # seconds between redraws of walking pets
+    FLIGHT_INTERVAL = 1 / 60  # and of pets in the air
+    DECISION_INTERVAL = 3.0
+    # Deadlines this close together are handled in the same wakeup
+    COALESCE = 0.008
+    
+    pets_changed = pyqtSignal(int)
+    
+    def __init__(self, parent=None, overlay_mode=False, seed=None, clock=time.monotonic, cursor=None):
+        super().__init__(parent)
+        # Everything random about the pets comes from the seed and every timestamp from `clock`,
+        # so a recorded session plays back the same, see replay()
+        self.seed = random.randrange(2 ** 32) if seed is None else seed
+        self.random = random.Random(self.seed)
+        self.now = clock
+        self.cursor = cursor or (lambda: QCursor.pos().x())
+        self.recorder = None
+        self.pets = []
+        self.pets_by_slot = {}
+        self.simulation = None
+        self.move_deadline = None
+        self.wakeups = 0
+        self.session_active = True
+        self.reminders = ReminderScheduler(self)
+        self.stats_window = None
+        self.timer_deadline = None
+        
+        # Walking and falling stay on the screen each pet is on, even as screens come and go
+        self.screens = ScreenCache(self)
+        self.screens.changed.connect(self.update_all_bounds)
+        
+        # Paint every pet into one click-through window per screen instead of a window per pet
+        self.overlay_mode = overlay_mode
+        self.overlays = {}
+        
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.tick)
+        
+        # Pets waiting for their frames show up as soon as the loader has them
+        asset_loader.strip_ready.connect(self.strip_ready)
+    
+    def spawn(self, count=1, hydration_enabled=False, hydration_interval=300,
+              posture_enabled=False, posture_interval=300, **settings):
+        # Reminders belong to the engine, they run as long as any pet is around
+        if hydration_enabled:
+            self.reminders.add("Hydration", hydration_interval)
+        if posture_enabled:
+            self.reminders.add("Posture", posture_interval)
+        
+        if self.overlay_mode and not self.overlays:
+            # Overlay windows are only created once there is something to show
+            app = QApplication.instance()
+            app.screenAdded.connect(self.add_overlay)
+            app.screenRemoved.connect(self.remove_overlay)
+            for screen in app.screens():
+                self.add_overlay(screen)
+        if self.simulation is None:
+            self.simulation = PetSimulation(seed=self.seed)
+        
+        pets = []
+        spawn_settings = settings
+        try:
+            for _ in range(count):
+                if self.pets or pets:
+                    # Spread extra pets along the walking line instead of stacking them
+                    spread = settings.get('max_travel', 850) // 2
+                    settings = dict(settings, x=500 + self.random.randint(-spread, spread))
+                pets.append(DesktopPet(self, **settings))
+        except Exception:
+            # Nothing outside knows about these pets yet, take back the whole spawn
+            for pet in pets:
+                pet.close()
+                self.simulation.remove(pet.slot)
+            raise
+        
+        # Start the clocks once every window exists, so slow spawns don't make the
+        # first frames rush to catch up
+        now = self.now()
+        self.record(now, 'spawn', count, spawn_settings)
+        for pet in pets:
+            pet.frame_deadline = now
+            pet.decision_deadline = now + self.DECISION_INTERVAL
+            self.pets_by_slot[pet.slot] = pet
+            self.update_bounds(pet)
+        self.pets.extend(pets)
+        self.pets_changed.emit(len(self.pets))
+        self.wake()
+        return pets
+    
+    def despawn(self, pet):
+        pet.close()
+    
+    def despawn_all(self):
+        for pet in list(self.pets):
+            pet.close()
+    
+    def remove(self, pet):
+        # Called by the pet itself once its window closes
+        if pet in self.pets:
+            self.record(self.now(), 'remove', pet.slot)
+            self.pets.remove(pet)
+            del self.pets_by_slot[pet.slot]
+            self.simulation.remove(pet.slot)
+            if self.overlay_mode:
+                self.invalidate(pet.drawn_rect, moved=True)
+            if not self.pets:
+                self.reminders.clear()
+            self.pets_changed.emit(len(self.pets))
+            self.wake()
+    
+    def add_overlay(self, screen):
+        self.overlays[screen] = PetOverlay(self, screen)
+    
+    def remove_overlay(self, screen):
+        overlay = self.overlays.pop(screen, None)
+        if overlay is not None:
+            overlay.close()
+    
+    def invalidate(self, rect, moved=False):
+        for overlay in self.overlays.values():
+            overlay.invalidate(rect, moved)
+    
+    def update_bounds(self, pet):
+        """ Keep the pet's walk and fall inside the available area of the screen it is on """
+        area = self.screens.available_at(pet.geometry_rect().center())
+        if area is None:
+            return
+        self.simulation.set_bounds(pet.slot, area.left(), area.right() + 1 - pet.sprite_size,
+                                   area.top(), area.bottom() + 1 - pet.sprite_size)
+    
+    def update_all_bounds(self):
+        """ Screens changed, pets standing on a floor that moved fall or pop onto the new one """
+        self.record(self.now(), 'screens', self.screens.to_list())
+        simulation = self.simulation
+        for pet in self.pets:
+            slot = pet.slot
+            old_floor = simulation.floor[slot]
+            self.update_bounds(pet)
+            if pet.is_dragging or pet.is_airborne:
+                continue
+            # Pets dropped mid-screen stay put unless the new area no longer holds them
+            outside = not (simulation.min_x[slot] <= pet.x <= simulation.max_x[slot]
+                           and simulation.min_y[slot] <= pet.y <= simulation.floor[slot])
+            if outside or (pet.y == old_floor and pet.y != simulation.floor[slot]):
+                simulation.throw(slot, 0.0, 0.0)
+        self.wake()
+    
+    def pixel_ratio(self, pet):
+        if not self.overlay_mode:
+            return pet.devicePixelRatioF()
+        center = pet.geometry_rect().center()
+        for overlay in self.overlays.values():
+            if overlay.geometry().contains(center):
+                return overlay.devicePixelRatioF()
+        return QApplication.instance().devicePixelRatio()
+    
+    def refresh(self, pet):
+        """ Show a pet's new frame right away, e.g. after its clock was seeked """
+        pet.frame_deadline = self.now()
+        self.wake()
+    
+    def set_session_active(self, active):
+        # Nothing runs while the screen is locked, overdue deadlines resync on resume
+        self.record(self.now(), 'session', active)
+        self.session_active = active
+        if active:
+            # Unlocking usually follows a resume, catch up on reminders right away
+            self.reminders.check()
+        self.wake()
+    
+    def strip_ready(self, animation, name):
+        # Pets drawn from a stand-in level switch to the finished one, even on a still frame
+        for pet in self.pets:
+            if pet.animation is animation:
+                pet.shown_animation = None
+        self.wake()
+    
+    def wake(self):
+        now = self.now()
+        self.record(now, 'wake')
+        self.schedule(now)
+    
+    def start_recording(self, path):
+        """ Trace what drives the pets from here on into `path`, for replay() """
+        load_numpy()
+        self.recorder = TraceRecorder(path, seed=self.seed, overlay=self.overlay_mode, numpy=bool(np),
+                                      screens=self.screens.to_list())
+    
+    def stop_recording(self):
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+    
+    def record(self, now, event, *args):
+        if self.recorder is not None:
+            self.recorder.record(now, event, *args)
+    
+    @instrumented('engine tick')
+    def tick(self):
+        self.wakeups += 1
+        now = self.now()
+        if perf_stats.enabled and self.timer_deadline is not None:
+            perf_stats.add_lateness('engine timer', now - self.timer_deadline)
+        due = now + self.COALESCE
+        move_due = self.move_deadline is not None and self.move_deadline <= due
+        if move_due:
+            # Chasing pets head wherever the cursor is at the start of the tick
+            cursor_x = self.cursor()
+            if cursor_x != self.simulation.cursor_x:
+                self.record(now, 'cursor', cursor_x)
+                self.simulation.cursor_x = cursor_x
+        self.record(now, 'tick')
+        
+        deciding = [pet for pet in self.pets
+                    if pet.decision_deadline is not None and pet.decision_deadline <= due]
+        if deciding:
+            self.decide(deciding, now)
+        
+        if move_due:
+            self.move(now)
+        
+        for pet in self.pets:
+            if pet.frame_deadline is None:
+                # Frames were parked, pick them up again once they can change or be seen
+                if not pet.needs_frames():
+                    continue
+                pet.frame_deadline = now
+            if pet.frame_deadline <= due:
+                if perf_stats.enabled:
+                    late = now - pet.frame_deadline
+                    perf_stats.add_lateness('frames', late)
+                    if late > perf_stats.LATE_FRAME:
+                        perf_stats.count('frames late')
+                # The clock gives the exact frame boundary, so late ticks never accumulate drift
+                remaining = pet.update_animation(due) / 1000
+                pet.frame_deadline = due + remaining if pet.needs_frames() else None
+        
+        if move_due:
+            self.move_deadline = next_deadline(self.move_deadline, self.move_interval(), now)
+        self.schedule(now)
+    
+    @instrumented('decisions')
+    def decide(self, pets, now):
+        durations = self.simulation.decide([pet.slot for pet in pets])
+        for pet, duration in zip(pets, durations):
+            pet.sync_animation()
+            pet.decision_deadline = next_deadline(pet.decision_deadline, duration, now)
+            if self.recorder is not None:
+                self.record(now, 'decide', pet.slot, int(self.simulation.behavior[pet.slot]), duration)
+    
+    @instrumented('movement')
+    def move(self, now):
+        # Fixed steps for the whole population up to now, widgets only read back
+        # the interpolated positions and only move when a whole pixel changed
+        moved, alpha = self.simulation.advance(now)
+        if moved:
+            # Pets that just turned are among the moved ones, so their facing is picked up below
+            turned = self.simulation.interact()
+            if turned and perf_stats.enabled:
+                perf_stats.count('pets met', len(turned))
+        for slot, x, y in self.simulation.render(moved, alpha):
+            self.pets_by_slot[slot].sync_position(x, y)
+    
+    def show_stats(self):
+        if self.stats_window is None:
+            self.stats_window = StatsWindow(self)
+        self.stats_window.show()
+        self.stats_window.raise_()
+        self.stats_window.activateWindow()
+    
+    def move_interval(self):
+        if any(pet.is_airborne for pet in self.pets):
+            return self.FLIGHT_INTERVAL
+        return self.MOVE_INTERVAL
+    
+    def schedule(self, now):
+        if not self.pets or not self.session_active:
+            self.timer.stop()
+            self.move_deadline = None
+            return
+        
+        # Movement only needs ticks while some visible pet is actually walking or falling
+        if any((pet.is_airborne or pet.is_moving) and not pet.is_dragging and pet.on_screen()
+               for pet in self.pets):
+            if self.move_deadline is None:
+                # Nothing moved since the last tick, don't simulate the gap
+                self.simulation.sync_clock(now)
+                self.move_deadline = now + self.move_interval()
+        else:
+            self.move_deadline = None
+        
+        for pet in self.pets:
+            if pet.frame_deadline is None and pet.needs_frames():
+                pet.frame_deadline = now
+        deadlines = [pet.frame_deadline for pet in self.pets if pet.frame_deadline is not None]
+        deadlines += [pet.decision_deadline for pet in self.pets if pet.decision_deadline is not None]
+        if self.move_deadline is not None:
+            deadlines.append(self.move_deadline)
+        if not deadlines:
+            # Every pet is idle on a static frame or out of sight
+            self.timer.stop()
+            self.timer_deadline = None
+            return
+        self.timer_deadline = min(deadlines)
+        self.timer.start(max(0, round((self.timer_deadline - now) * 1000)))
+
+class StatsWindow(QDialog):
+    """ Live view of perf_stats for one engine, recording starts when it is first opened """
+    def __init__(self, engine):
+        super().__init__(None, Qt.Window | Qt.WindowStaysOnTopHint)
+        self.setWindowTitle("deskpet stats")
+        self.engine = engine
+        
+        layout = QVBoxLayout(self)
+        self.report = QPlainTextEdit()
+        self.report.setReadOnly(True)
+        self.report.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        layout.addWidget(self.report)
+        
+        buttons = QHBoxLayout()
+        reset_button = QPushButton("Reset")
+        reset_button.clicked.connect(self.reset)
+        save_button = QPushButton("Save JSON...")
+        save_button.clicked.connect(self.save)
+        buttons.addStretch()
+        buttons.addWidget(reset_button)
+        buttons.addWidget(save_button)
+        layout.addLayout(buttons)
+        self.resize(560, 480)
+        
+        # Only refreshed while open
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(1000)
+        self.refresh_timer.timeout.connect(self.refresh)
+    
+    def snapshot(self):
+        return perf_stats.snapshot(pets=len(self.engine.pets), wakeups=self.engine.wakeups)
+    
+    def refresh(self):
+        stats = self.snapshot()
+        lines = [f"recording for {stats['seconds']:.0f} s, {stats['pets']} pets, {stats['wakeups']} wakeups"]
+        if stats['resident_bytes'] is not None:
+            lines.append(f"resident memory      {stats['resident_bytes'] / 2 ** 20:8.1f} MB")
+        budget = stats['pixmap_budget_bytes']
+        lines.append(f"pixmap budget        {budget['used'] / 2 ** 20:8.1f} / {budget['limit'] / 2 ** 20:.0f} MB")
+        for title, table in (('callbacks', stats['callbacks']), ('lateness', stats['lateness'])):
+            lines += ['', f"{title:<20} {'count':>8} {'mean us':>10} {'p95 us':>10} {'max us':>10}"]
+            for name, summary in sorted(table.items()):
+                lines.append(f"{name:<20} {summary['count']:>8} {summary['mean_us']:>10.1f} "
+                             f"{summary['p95_us']:>10} {summary['max_us']:>10.1f}")
+        lines.append('')
+        for name, count in sorted(stats['counters'].items()):
+            lines.append(f"{name:<20} {count:>8}")
+        self.report.setPlainText("\n".join(lines))
+    
+    def reset(self):
+        perf_stats.reset()
+        self.refresh()
+    
+    def save(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Save stats", "deskpet-stats.json", "JSON (*.json)")
+        if path:
+            perf_stats.dump(path, pets=len(self.engine.pets), wakeups=self.engine.wakeups)
+    
+    def showEvent(self, event):
+        super().showEvent(event)
+        perf_stats.enable()
+        self.refresh()
+        self.refresh_timer.start()
+    
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.refresh_timer.stop()
+
+class PetOverlay(QWidget):
+    """ Full-screen transparent window that paints all pets on one screen in a single paintEvent """
+    def __init__(self, engine, screen):
+        super().__init__(None, Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint | Qt.Tool)
+        self.setAttribute(Qt.WA_TranslucentBackground)
+        self.setAttribute(Qt.WA_ShowWithoutActivating)
+        self.engine = engine
+        self.grabbed = None
+        self.setGeometry(screen.geometry())
+        screen.geometryChanged.connect(self.move_to_screen)
+        
+        # Input mask follows the opaque pixels of the pets, everything else clicks through to the desktop.
+        # Rebuilt at most once per event loop pass however many pets moved.
+        self.mask_timer = QTimer(self)
+        self.mask_timer.setSingleShot(True)
+        self.mask_timer.timeout.connect(self.update_mask)
+    
+    def move_to_screen(self, geometry):
+        self.setGeometry(geometry)
+        self.update()
+        self.mask_timer.start(0)
+    
+    def local_rect(self, rect):
+        return rect.translated(-self.geometry().topLeft())
+    
+    def invalidate(self, rect, moved=False):
+        local = self.local_rect(rect)
+        if not local.intersects(self.rect()):
+            return
+        self.update(local)
+        if moved:
+            self.mask_timer.start(0)
+    
+    def update_mask(self):
+        region = QRegion()
+        for pet in self.engine.pets:
+            region += self.hit_region(pet)
+        region &= QRegion(self.rect())
+        
+        # An empty mask would mean no mask at all, so hide instead
+        if region.isEmpty():
+            self.hide()
+        else:
+            self.setMask(region)
+            self.show()
+    
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        region = event.region()
+        for pet in self.engine.pets:
+            rect = self.local_rect(pet.drawn_rect)
+            if pet.frame_sheet is not None and region.intersects(rect):
+                SpriteView.draw_frame(painter, rect.topLeft(), pet.frame_sheet, pet.frame_source,
+                                      pet.frame_target, pet.frame_mirrored)
+    
+    def hit_region(self, pet):
+        rect = self.local_rect(pet.drawn_rect)
+        if pet.frame_mask is None:
+            return QRegion(rect)
+        return pet.frame_mask.translated(rect.topLeft())
+    
+    def pet_at(self, pos):
+        # Last pet is painted on top, so it gets the click
+        for pet in reversed(self.engine.pets):
+            if self.hit_region(pet).contains(pos):
+                return pet
+        return None
+    
+    def forward(self, pet, event, handler):
+        local_pos = event.localPos() - QPointF(self.local_rect(pet.drawn_rect).topLeft())
+        handler(QMouseEvent(event.type(), local_pos, event.windowPos(), event.screenPos(),
+                            event.button(), event.buttons(), event.modifiers()))
+    
+    def mousePressEvent(self, event):
+        self.grabbed = self.pet_at(event.pos())
+        if self.grabbed is not None:
+            self.forward(self.grabbed, event, self.grabbed.mousePressEvent)
+    
+    def mouseMoveEvent(self, event):
+        if self.grabbed is not None:
+            self.forward(self.grabbed, event, self.grabbed.mouseMoveEvent)
+    
+    def mouseReleaseEvent(self, event):
+        if self.grabbed is not None:
+            self.forward(self.grabbed, event, self.grabbed.mouseReleaseEvent)
+            self.grabbed = None
+    
+    def mouseDoubleClickEvent(self, event):
+        pet = self.pet_at(event.pos())
+        if pet is not None:
+            self.forward(pet, event, pet.mouseDoubleClickEvent)
+
+TRACE_VERSION = 1
+
+class TraceRecorder:
+    """ What drives the pets, one JSON array [time, event, ...] per line of a gzip file after a header line
+    with the seed and screens. Ticks, wakeups, spawns, drags, resizes, screen and session changes are
+    replayed; decisions and frame changes are kept to check the replay against.
+    """
+    # Seconds of events at most lost when the recording app is killed
+    FLUSH_INTERVAL = 1.0
+    
+    def __init__(self, path=None, **header):
+        # Without a path events are only kept in memory, replay() compares them with the trace
+        self.file = None
+        self.events = []
+        self.flushed = None
+        if path is not None:
+            self.file = gzip.open(path, 'wt', encoding='utf-8')
+            self.file.write(json.dumps(dict(header, version=TRACE_VERSION)) + '\n')
+            self.file.flush()
+    
+    def record(self, *event):
+        if self.file is None:
+            self.events.append(list(event))
+            return
+        self.file.write(json.dumps(event, separators=(',', ':')) + '\n')
+        # A sync flush ends a readable gzip block, so a crashed session still leaves a trace
+        now = event[0]
+        if self.flushed is None:
+            self.flushed = now
+        elif now - self.flushed >= self.FLUSH_INTERVAL:
+            self.file.flush()
+            self.flushed = now
+    
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+class ManualClock:
+    """ Stands in for time.monotonic in a replay, time only moves when it is set """
+    def __init__(self, now=0.0):
+        self.now = now
+    
+    def __call__(self):
+        return self.now
+
+def read_trace(path):
+    events = []
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        try:
+            header = json.loads(f.readline())
+        except (EOFError, OSError, ValueError):
+            header = None
+        if not isinstance(header, dict) or header.get('version') != TRACE_VERSION:
+            raise ValueError(f"{path} is not a deskpet trace of version {TRACE_VERSION}")
+        try:
+            for line in f:
+                events.append(json.loads(line))
+        except (EOFError, ValueError):
+            pass  # Cut short when the recording app was killed, play what is there
+    return header, events
+
+def replay(path):
+    """ Play a trace back headless, as fast as the pets can be stepped and painted.
+    
+    Returns perf_stats of the replay, with the time per tick and per paint as 'replay tick' and 'replay paint',
+    and whether the pets made the same decisions as in the recording. Frames can differ while the recording
+    was still loading animations, the replay loads them before the first tick.
+    """
+    header, events = read_trace(path)
+    if header['numpy'] != bool(load_numpy()):
+        print("Recorded with" + ("" if header['numpy'] else "out") + " NumPy, decisions will differ", file=sys.stderr)
+    
+    clock = ManualClock(events[0][0] if events else 0.0)
+    cursor = [None]
+    engine = PetEngine(None, header['overlay'], seed=header['seed'], clock=clock, cursor=lambda: cursor[0])
+    engine.screens.from_list(header['screens'])
+    engine.recorder = TraceRecorder()
+    app = QApplication.instance()
+    perf_stats.reset()
+    perf_stats.enable()
+    
+    mouse = {
+        'press': (QEvent.MouseButtonPress, Qt.LeftButton, Qt.LeftButton),
+        'move': (QEvent.MouseMove, Qt.NoButton, Qt.LeftButton),
+        'release': (QEvent.MouseButtonRelease, Qt.LeftButton, Qt.NoButton),
+    }
+    started = time.perf_counter()
+    for now, event, *args in events:
+        clock.now = now
+        if event == 'tick':
+            start = time.perf_counter()
+            engine.tick()
+            # Only the trace decides when the engine runs
+            engine.timer.stop()
+            ticked = time.perf_counter()
+            app.processEvents()
+            perf_stats.add_duration('replay tick', ticked - start)
+            perf_stats.add_duration('replay paint', time.perf_counter() - ticked)
+        elif event == 'spawn':
+            count, settings = args
+            for pet in engine.spawn(count, **settings):
+                pet.update_scale()
+            asset_loader.wait()
+        elif event == 'remove':
+            engine.pets_by_slot[args[0]].close()
+        elif event == 'wake':
+            engine.wake()
+        elif event == 'session':
+            engine.set_session_active(args[0])
+        elif event == 'cursor':
+            cursor[0] = args[0]
+        elif event == 'screens':
+            engine.screens.from_list(args[0])
+            engine.update_all_bounds()
+        elif event == 'size':
+            engine.pets_by_slot[args[0]].set_sprite_size(args[1])
+        elif event in mouse:
+            slot, x, y, global_x, global_y = args
+            event_type, button, buttons = mouse[event]
+            pet = engine.pets_by_slot[slot]
+            handler = {'press': pet.mousePressEvent, 'move': pet.mouseMoveEvent, 'release': pet.mouseReleaseEvent}[event]
+            handler(QMouseEvent(event_type, QPointF(x, y), QPointF(global_x, global_y), button, buttons, Qt.NoModifier))
+        engine.timer.stop()
+    elapsed = time.perf_counter() - started
+    
+    def checks(trace, name):
+        return [event for event in trace if event[1] == name]
+    recorded = checks(events, 'decide')
+    replayed = checks(engine.recorder.events, 'decide')
+    diverged = next((index for index, (old, new) in enumerate(zip(recorded, replayed)) if old != new), None)
+    if diverged is None and len(recorded) != len(replayed):
+        diverged = min(len(recorded), len(replayed))
+    report = perf_stats.snapshot(
+        trace=path,
+        seed=header['seed'],
+        recorded_seconds=events[-1][0] - events[0][0] if events else 0.0,
+        replay_seconds=elapsed,
+        decisions={'recorded': len(recorded), 'replayed': len(replayed), 'diverged_at': diverged},
+        frames={'recorded': len(checks(events, 'frame')), 'replayed': len(checks(engine.recorder.events, 'frame'))},
+    )
+    engine.despawn_all()
+    return report
+
+# One running deskpet per user, later launches hand their command to it
+CONTROL_SERVER = f"deskpet-{getpass.getuser()}"
+
+class ControlServer(QObject):
+    """ Local socket of the running instance. Clients send one JSON command per line and get one JSON reply line:
+    
+    {"command": "spawn", "count": 3, "size": 64, "pack": "path"}
+    {"command": "despawn", "count": 1}  (newest pets first, every pet without a count)
+    {"command": "remind", "name": "Hydration", "interval": 600}  (no interval turns it off)
+    {"command": "stats"}
+    {"command": "show"}
+    """
+    def __init__(self, selector, name=CONTROL_SERVER):
+        super().__init__(selector)
+        self.selector = selector
+        self.server = QLocalServer(self)
+        self.server.setSocketOptions(QLocalServer.UserAccessOption)
+        self.server.newConnection.connect(self.accept)
+        # Listening would take the name over from a live instance, so ask first
+        self.listening = False
+        if not instance_running(name):
+            self.listening = self.server.listen(name)
+            if not self.listening:
+                # A crashed instance can leave its socket behind
+                QLocalServer.removeServer(name)
+                self.listening = self.server.listen(name)
+    
+    def accept(self):
+        while self.server.hasPendingConnections():
+            socket = self.server.nextPendingConnection()
+            socket.readyRead.connect(lambda socket=socket: self.read(socket))
+            socket.disconnected.connect(socket.deleteLater)
+    
+    def read(self, socket):
+        while socket.canReadLine():
+            reply = self.reply(bytes(socket.readLine()))
+            socket.write(json.dumps(reply).encode('utf-8') + b'\n')
+    
+    def reply(self, line):
+        # Anything escaping here would abort the running instance, a bad command only fails itself
+        try:
+            return self.handle(json.loads(line) if isinstance(line, bytes) else line)
+        except Exception as error:
+            return {'ok': False, 'error': str(error) or type(error).__name__}
+    
+    def handle(self, request):
+        engine = self.selector.engine
+        command = request['command']
+        reply = {'ok': True}
+        if command == 'spawn':
+            pack = request.get('pack') or self.selector.pack
+            if not os.path.exists(pack):
+                raise ValueError(f"no pet pack at {pack}")
+            engine.spawn(int(request.get('count', 1)),
+                         sprite_size=int(request.get('size') or self.selector.sprite_size),
+                         max_travel=850,
+                         pack=pack)
+        elif command == 'despawn':
+            count = request.get('count')
+            # A copy, every despawn takes the pet out of engine.pets
+            pets = list(engine.pets) if count is None else engine.pets[max(0, len(engine.pets) - int(count)):]
+            for pet in reversed(pets):
+                engine.despawn(pet)
+        elif command == 'remind':
+            if request.get('interval') is None:
+                engine.reminders.remove(request['name'])
+            else:
+                interval = float(request['interval'])
+                if not interval > 0:
+                    raise ValueError("reminder interval must be a positive number of seconds")
+                engine.reminders.add(request['name'], interval)
+        elif command == 'stats':
+            # Recording starts with the first request, like opening the Stats window
+            perf_stats.enable()
+            reply['stats'] = perf_stats.snapshot(pets=len(engine.pets), wakeups=engine.wakeups)
+        elif command == 'show':
+            self.selector.showNormal()
+            self.selector.raise_()
+            self.selector.activateWindow()
+        else:
+            raise ValueError(f"unknown command {command!r}")
+        reply['pets'] = len(engine.pets)
+        return reply
+
+def instance_running(name=CONTROL_SERVER, timeout=500):
+    """ Whether a deskpet is listening on the control server, without sending it anything """
+    socket = QLocalSocket()
+    socket.connectToServer(name)
+    running = socket.waitForConnected(timeout)
+    socket.abort()
+    return running
+
+def send_command(request, name=CONTROL_SERVER, timeout=2000):
+    """ Hand a command to the running instance and return its reply, None when nothing is running """
+    socket = QLocalSocket()
+    socket.connectToServer(name)
+    if not socket.waitForConnected(timeout):
+        return None
+    socket.write(json.dumps(request).encode('utf-8') + b'\n')
+    socket.waitForBytesWritten(timeout)
+    reply = b''
+    while not reply.endswith(b'\n') and socket.waitForReadyRead(timeout):
+        reply += bytes(socket.readAll())
+    socket.disconnectFromServer()
+    if not reply:
+        return {'ok': False, 'error': 'no reply from the running deskpet'}
+    return json.loads(reply)
+
+def command_request(args):
+    """ The control server command for the command line, a bare launch brings the running selector up """
+    if args.command == 'spawn':
+        return {'command': 'spawn', 'count': args.count, 'size': args.size,
+                'pack': args.pack and os.path.abspath(args.pack)}
+    if args.command == 'despawn':
+        return {'command': 'despawn', 'count': args.count}
+    if args.command == 'remind':
+        return {'command': 'remind', 'name': args.name,
+                'interval': args.interval}
+    return {'command': args.command or 'show'}
+
+def reminder_interval(value):
+    """ Seconds between reminders from the command line, None for 'off' """
+    if value == 'off':
+        return None
+    try:
+        interval = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{value!r} is not a number of seconds or 'off'")
+    if not interval > 0:
+        raise argparse.ArgumentTypeError("the interval must be a positive number of seconds")
+    return interval
+
+def startup_options(parser, args):
+    """ Options given that only take effect when deskpet starts, a running instance can't honour them """
+    given = []
+    for action in parser._actions:
+        if not action.option_strings or action.dest in ('help', 'command', 'compile_atlas', 'replay'):
+            continue
+        # The pack goes along with a spawn, for anything else it picks the selector's pack at start
+        if action.dest == 'pack' and args.command == 'spawn':
+            continue
+        if getattr(args, action.dest) != action.default:
+            given.append(action.option_strings[0])
+    return given
+
+def print_reply(args, reply):
+    if not reply.get('ok'):
+        print(f"deskpet: {reply.get('error')}", file=sys.stderr)
+        return 1
+    if 'stats' in reply:
+        print(json.dumps(reply['stats'], indent=2))
+    elif args.command is not None:
+        print(f"{reply['pets']} pets")
+    return 0
+
 def main():
-    app = QApplication(sys.argv)
+    parser = argparse.ArgumentParser(prog='deskpet')
+    parser.add_argument('--overlay', action='store_true',
+                        help='paint all pets into one overlay window per screen')
+    parser.add_argument('--pack', help='pet pack directory or zip to use (default: the bundled goose)')
+    parser.add_argument('--pixmap-budget', type=int, default=32, metavar='MB',
+                        help='memory for scaled frames across all packs, least recently shown go first')
+    parser.add_argument('--compile-atlas', action='store_true',
+                        help='write pack.atlas into the pet pack (or the user cache for zips) and exit')
+    parser.add_argument('--timeline', action='store_true',
+                        help='log how long each startup phase takes (same as DESKPET_TIMELINE=1)')
+    parser.add_argument('--stats', action='store_true',
+                        help='record performance stats from the start (same as DESKPET_STATS=1)')
+    parser.add_argument('--seed', type=int, help='seed for everything random about the pets')
+    parser.add_argument('--record', metavar='TRACE', help='record the session to a trace file for --replay')
+    parser.add_argument('--replay', metavar='TRACE',
+                        help='play a recorded trace back headless at full speed, print timings as JSON and exit')
+    commands = parser.add_subparsers(dest='command', metavar='command',
+                                     help='sent to the running deskpet, one is started first if needed')
+    spawn_parser = commands.add_parser('spawn', help='add pets')
+    spawn_parser.add_argument('count', type=int, nargs='?', default=1)
+    spawn_parser.add_argument('--size', type=int, help='pet size in px')
+    despawn_parser = commands.add_parser('despawn', help='remove the newest pets, all of them without a count')
+    despawn_parser.add_argument('count', type=int, nargs='?')
+    remind_parser = commands.add_parser('remind', help='set a reminder, e.g. remind Hydration 600')
+    remind_parser.add_argument('name')
+    remind_parser.add_argument('interval', type=reminder_interval, help="seconds between reminders, or 'off'")
+    commands.add_parser('stats', help='print the running instance\'s performance stats as JSON')
+    args, qt_args = parser.parse_known_args()
+    
+    if args.replay:
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        app = QApplication(sys.argv[:1] + qt_args)
+        try:
+            report = replay(args.replay)
+        except (OSError, ValueError) as error:
+            print(f"deskpet: {error}", file=sys.stderr)
+            return 1
+        print(json.dumps(report, indent=2))
+        return 0
+    
+    # Forward to the instance that is already up instead of starting another one
+    request = command_request(args)
+    if not args.compile_atlas:
+        ignored = startup_options(parser, args)
+        if ignored and instance_running():
+            print(f"deskpet: already running, {', '.join(ignored)} only apply when it starts", file=sys.stderr)
+            return 1
+        reply = send_command(request)
+        if reply is not None:
+            return print_reply(args, reply)
+        if args.command == 'stats':
+            print("deskpet is not running", file=sys.stderr)
+            return 1
+    
+    if args.timeline:
+        timeline.enable()
+    if args.stats:
+        perf_stats.enable()
+    pixmap_budget.limit = args.pixmap_budget * 1024 * 1024
+    pack = args.pack or resource_path(DEFAULT_PACK)
+    
+    app = QApplication(sys.argv[:1] + qt_args)
+    timeline.mark('application created')
+    
+    if args.compile_atlas:
+        compile_atlas(PetPack(pack))
+        return 0
+    
+    install_theme(app)
+    timeline.mark('theme installed')
     
     app_icon = QIcon('icon.ico')
     app.setWindowIcon(app_icon)
@@ -744,24 +3187,32 @@ def main():
         myappid = u'mycompany.deskpet.version1'
         ctypes.windll.shell32.SetCurrentProcessExplicitAppUserModelID(myappid)
     
-    selector = SpriteSelector()
-    selector.selected_sprite = QPixmap(resource_path("goose.png"))
+    selector = SpriteSelector(args.overlay, pack, args.seed)
     selector.start_btn.setEnabled(True)
+    server = ControlServer(selector)
+    if not server.listening:
+        # Another launch got the control server first, hand the command to it after all
+        reply = send_command(request)
+        if reply is not None:
+            return print_reply(args, reply)
+    timeline.mark('control server listening')
+    if args.record:
+        selector.engine.start_recording(args.record)
     
     for child in selector.findChildren(QPushButton):
         if child.text() == 'Select Sprite Image':
             child.setVisible(False)
             break
-            
-    selector.preview.setPixmap(selector.selected_sprite.scaled(
-        selector.sprite_size, 
-        selector.sprite_size,
-        Qt.KeepAspectRatio,
-        Qt.SmoothTransformation
-    ))
     
+    # The preview fills in from the shared sprites once the dialog is painted,
+    # no need to decode the whole sheet here first
     selector.show()
-    return app.exec_()
+    timeline.mark('selector shown')
+    if args.command is not None:
+        print_reply(args, server.reply(request))
+    result = app.exec_()
+    selector.engine.stop_recording()
+    return result
 
 if __name__ == '__main__':
     sys.exit(main())
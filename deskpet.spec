@@ -4,8 +4,7 @@ block_cipher = None
 
 # Make sure these paths match your actual file locations
 added_files = [
-    ('goose.json', '.'),
-    ('goose.png', '.'),
+    ('packs', 'packs'),  # includes pack.atlas from `python deskpet.py --compile-atlas`, if present
     ('icon.ico', '.'),
     ('logo.png', '.')
 ]
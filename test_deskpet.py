@@ -0,0 +1,527 @@
+""" Headless checks for the parts of deskpet that don't need a display, run with `python -m pytest` """
+import gzip
+import os
+import random
+import shutil
+import socket
+import sys
+
+# Run without a display unless a platform was asked for explicitly
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import pytest
+from PyQt5.QtWidgets import QApplication
+
+import deskpet
+
+GOOSE = os.path.join(os.path.dirname(os.path.abspath(__file__)), deskpet.DEFAULT_PACK)
+
+@pytest.fixture(scope='session')
+def app():
+    return QApplication.instance() or QApplication([])
+
+@pytest.fixture(params=['numpy', 'python'])
+def backend(request, monkeypatch):
+    """ Runs a test against both PetSimulation code paths, whatever the number of pets """
+    if request.param == 'numpy':
+        if not deskpet.load_numpy():
+            pytest.skip('numpy is not installed')
+        monkeypatch.setattr(deskpet.PetSimulation, 'VECTORIZE_AT', 0)
+    else:
+        monkeypatch.setattr(deskpet, 'np', False)
+    return request.param
+
+def run_population(steps=300):
+    """ Walkers, a chaser and thrown pets on a 800x600 screen, stepped at the fixed timestep """
+    simulation = deskpet.PetSimulation(capacity=4)
+    behavior = deskpet.Behavior(deskpet.DEFAULT_BEHAVIOR, {'idle': None, 'walking': None})
+    offset = simulation.add_behavior(behavior)
+    walk = offset + behavior.names.index('walk')
+    
+    slots = []
+    for x, max_travel in ((100, 120), (400, 850), (690, 300)):
+        slot = simulation.add(x, 500, max_travel, 96)
+        simulation.set_bounds(slot, 0, 704, 0, 504)
+        simulation.enter([slot], [walk])
+        slots.append(slot)
+    
+    chaser = simulation.add(600, 504, 850, 96)
+    simulation.set_bounds(chaser, 0, 704, 0, 504)
+    simulation.enter([chaser], [walk])
+    simulation.state[chaser] |= simulation.CHASING
+    simulation.cursor_x = 550
+    slots.append(chaser)
+    
+    for x, y, vx, vy in ((300, 100, 1500, -900), (50, 400, -800, 0), (650, 20, 300, -2000)):
+        slot = simulation.add(x, y, 850, 96)
+        simulation.set_bounds(slot, 0, 704, 0, 504)
+        simulation.throw(slot, vx, vy)
+        slots.append(slot)
+    
+    trail = []
+    for _ in range(steps):
+        moved = simulation.step(simulation.DT)
+        trail.append(sorted(moved))
+    final = [(float(simulation.x[slot]), float(simulation.y[slot]), int(simulation.direction[slot]),
+              int(simulation.state[slot])) for slot in slots]
+    return trail, final
+
+def test_step_paths_agree(monkeypatch):
+    if not deskpet.load_numpy():
+        pytest.skip('numpy is not installed')
+    monkeypatch.setattr(deskpet.PetSimulation, 'VECTORIZE_AT', 0)
+    numpy_trail, numpy_final = run_population()
+    monkeypatch.setattr(deskpet, 'np', False)
+    python_trail, python_final = run_population()
+    
+    assert numpy_trail == python_trail
+    for (x, y, direction, state), expected in zip(numpy_final, python_final):
+        assert (x, y) == pytest.approx(expected[:2])
+        assert (direction, state) == expected[2:]
+
+def test_step_lands_and_stays_in_bounds(backend):
+    _, final = run_population()
+    for x, y, _, state in final:
+        assert 0 <= x <= 704
+        assert 0 <= y <= 504
+        assert not state & deskpet.PetSimulation.AIRBORNE
+    # The chaser stopped with its middle on the cursor
+    x, _, _, _ = final[3]
+    assert x + 48 == pytest.approx(550)
+
+def test_step_slots_only_moves_given_slots(backend):
+    simulation = deskpet.PetSimulation()
+    behavior = deskpet.Behavior(deskpet.DEFAULT_BEHAVIOR, {'idle': None, 'walking': None})
+    walk = simulation.add_behavior(behavior) + behavior.names.index('walk')
+    first = simulation.add(100, 500, 850, 96)
+    second = simulation.add(300, 500, 850, 96)
+    simulation.enter([first, second], [walk, walk])
+    
+    assert simulation.step(simulation.DT, [second]) == [second]
+    assert float(simulation.x[first]) == 100
+    assert float(simulation.x[second]) == pytest.approx(300 + simulation.WALK_SPEED * simulation.DT)
+
+def test_population_picks_the_simulation_path():
+    if not deskpet.load_numpy():
+        pytest.skip('numpy is not installed')
+    simulation = deskpet.PetSimulation()
+    behavior = deskpet.Behavior(deskpet.DEFAULT_BEHAVIOR, {'idle': None, 'walking': None})
+    walk = simulation.add_behavior(behavior) + behavior.names.index('walk')
+    slots = [simulation.add(10 * slot, 500, 850, 96) for slot in range(simulation.VECTORIZE_AT - 1)]
+    simulation.enter(slots, [walk] * len(slots))
+    assert not simulation.vectorized
+    assert isinstance(simulation.x, list)
+    
+    slots.append(simulation.add(400, 500, 850, 96))
+    assert simulation.vectorized
+    simulation.enter(slots[-1:], [walk])
+    simulation.step(simulation.DT)
+    moved = [float(simulation.x[slot]) for slot in slots]
+    
+    # Dropping under half the mark goes back to lists with the state intact
+    kept = simulation.VECTORIZE_AT // 2 - 1
+    for slot in slots[kept:]:
+        simulation.remove(slot)
+    assert not simulation.vectorized
+    assert simulation.x[:len(slots)] == pytest.approx(moved)
+    assert simulation.motion[walk] == simulation.MOVING
+    assert simulation.step(simulation.DT) == slots[:kept]
+
+def alias_probabilities(threshold, alias):
+    """ Chance of each outcome: its own column below the threshold plus every column aliasing to it """
+    share = 1.0 / len(threshold)
+    probabilities = [share * kept for kept in threshold]
+    for column, target in enumerate(alias):
+        probabilities[target] += share * (1.0 - threshold[column])
+    return probabilities
+
+@pytest.mark.parametrize('weights', [
+    [1, 1],
+    [1, 4, 0.5, 1, 0.5],
+    [0, 3, 0, 1],
+    [7],
+])
+def test_alias_table_matches_weights(weights):
+    threshold, alias = deskpet.Behavior.alias_table(weights)
+    total = sum(weights)
+    assert alias_probabilities(threshold, alias) == pytest.approx([weight / total for weight in weights])
+    # Columns without weight are never the outcome
+    for column, weight in enumerate(weights):
+        if weight == 0:
+            assert threshold[column] == 0 or alias[column] != column
+
+def test_alias_table_needs_a_next_state():
+    with pytest.raises(ValueError):
+        deskpet.Behavior.alias_table([0, 0])
+
+def test_decide_follows_weights(backend):
+    spec = {
+        'initial': 'idle',
+        'states': {
+            'idle': {'animation': 'idle', 'duration': [2, 5], 'next': {'idle': 1, 'walk': 3}},
+            'walk': {'animation': 'walking', 'motion': 'walk', 'duration': 4, 'next': {'idle': 1}},
+        },
+    }
+    behavior = deskpet.Behavior(spec, {'idle': None, 'walking': None})
+    simulation = deskpet.PetSimulation(capacity=2000, seed=3)
+    offset = simulation.add_behavior(behavior)
+    slots = [simulation.add(0, 0, 850, 96) for _ in range(2000)]
+    simulation.enter(slots, [offset] * len(slots))
+    
+    durations = simulation.decide(slots)
+    walking = sum(1 for slot in slots if simulation.behavior[slot] == offset + 1)
+    assert walking / len(slots) == pytest.approx(0.75, abs=0.04)
+    for slot, duration in zip(slots, durations):
+        if simulation.behavior[slot] == offset + 1:
+            assert duration == 4
+            assert simulation.state[slot] & simulation.MOVING
+        else:
+            assert 2 <= duration <= 5
+            assert not simulation.state[slot] & simulation.MOVING
+
+def test_decide_is_repeatable_with_a_seed(backend):
+    behavior = deskpet.Behavior(deskpet.DEFAULT_BEHAVIOR, {'idle': None, 'walking': None})
+    
+    def decisions(seed):
+        simulation = deskpet.PetSimulation(seed=seed)
+        offset = simulation.add_behavior(behavior)
+        slots = [simulation.add(0, 0, 850, 96) for _ in range(10)]
+        simulation.enter(slots, [offset] * len(slots))
+        return [(simulation.decide(slots), [int(simulation.behavior[slot]) for slot in slots]) for _ in range(5)]
+    
+    assert decisions(11) == decisions(11)
+
+def test_spatial_hash_pairs_cover_every_close_pair():
+    rng = random.Random(5)
+    points = [(rng.uniform(0, 500), rng.uniform(0, 300)) for _ in range(200)]
+    reach = 40.0
+    grid = deskpet.SpatialHash()
+    grid.rebuild(reach, range(len(points)), [x for x, _ in points], [y for _, y in points])
+    
+    candidates = [frozenset(pair) for pair in grid.pairs()]
+    # Each pair once, never a pet with itself
+    assert len(candidates) == len(set(candidates))
+    assert all(len(pair) == 2 for pair in candidates)
+    close = {frozenset((a, b)) for a in range(len(points)) for b in range(a + 1, len(points))
+             if abs(points[a][0] - points[b][0]) < reach and abs(points[a][1] - points[b][1]) < reach}
+    assert close <= set(candidates)
+
+@pytest.fixture
+def scheduler(app):
+    scheduler = deskpet.ReminderScheduler()
+    scheduler.now = deskpet.ManualClock()
+    scheduler.notified = []
+    scheduler.notify = scheduler.notified.append
+    yield scheduler
+    scheduler.clear()
+
+def test_reminders_catch_up_once_after_a_gap(scheduler):
+    scheduler.add('Hydration', 10)
+    scheduler.now.now = 9.9
+    scheduler.check()
+    assert scheduler.notified == []
+    
+    # Three periods went by while asleep, remind once and resync to a full interval from now
+    scheduler.now.now = 35
+    scheduler.check()
+    assert scheduler.notified == [['Hydration']]
+    assert scheduler.queue[0][0] == 45
+    
+    scheduler.now.now = 45
+    scheduler.check()
+    assert scheduler.notified == [['Hydration'], ['Hydration']]
+    assert scheduler.queue[0][0] == 55
+
+def test_reminders_replace_and_remove(scheduler):
+    scheduler.add('Hydration', 10)
+    scheduler.add('Posture', 15)
+    scheduler.add('Hydration', 30)  # the 10 s entry is stale now
+    scheduler.now.now = 20
+    scheduler.check()
+    assert scheduler.notified == [['Posture']]
+    
+    scheduler.remove('Posture')
+    scheduler.now.now = 100
+    scheduler.check()
+    assert scheduler.notified == [['Posture'], ['Hydration']]
+
+@pytest.mark.parametrize('interval', [0, -5, float('nan')])
+def test_reminders_refuse_intervals_that_never_advance(scheduler, interval):
+    with pytest.raises(ValueError):
+        scheduler.add('Hydration', interval)
+    assert scheduler.queue == []
+
+def test_next_deadline_keeps_the_cadence():
+    assert deskpet.next_deadline(10, 10, 12) == 20
+    assert deskpet.next_deadline(10, 10, 25) == 35
+
+def test_atlas_round_trip(app, tmp_path):
+    pack_path = tmp_path / 'goose'
+    shutil.copytree(GOOSE, pack_path)
+    pack = deskpet.PetPack(str(pack_path))
+    decoded = deskpet.decode_frames(pack)
+    atlas_path = str(tmp_path / 'goose.atlas')
+    deskpet.write_atlas(atlas_path, pack.digest(), decoded)
+    
+    entries, data = deskpet.load_atlas(atlas_path, pack.digest())
+    assert sorted(entries) == sorted(decoded)
+    for name, frames in decoded.items():
+        assert len(entries[name]) == len(frames)
+        for (offset, width, height, bytes_per_line, duration), (image, expected_duration) in zip(entries[name], frames):
+            assert (width, height, duration) == (image.width(), image.height(), expected_duration)
+            assert bytes(data[offset:offset + bytes_per_line * height]) == image.constBits().asstring(image.byteCount())
+    
+    # A changed pack no longer matches its atlas
+    assert deskpet.load_atlas(atlas_path, 'stale') is None
+    assert deskpet.load_atlas(str(tmp_path / 'missing.atlas'), pack.digest()) is None
+
+def test_compiled_atlas_is_used_for_frames(app, tmp_path):
+    pack_path = tmp_path / 'goose'
+    shutil.copytree(GOOSE, pack_path)
+    pack = deskpet.PetPack(str(pack_path))
+    deskpet.compile_atlas(pack, str(pack_path / 'pack.atlas'))
+    
+    animation = deskpet.SpriteAnimation(deskpet.PetPack(str(pack_path)))
+    assert animation.atlas is not None
+    decoded = deskpet.decode_frames(pack)
+    for name, frames in decoded.items():
+        images = animation.frame_images(name)
+        assert [image.size() for image, _ in images] == [image.size() for image, _ in frames]
+        assert images[0][0] == frames[0][0]
+
+def test_budget_charges_a_re_added_key_once():
+    evicted = []
+    budget = deskpet.PixmapBudget(100)
+    budget.add('walk', 60, lambda: evicted.append('walk'))
+    budget.add('walk', 60, lambda: evicted.append('walk'))
+    assert budget.used == 60
+    
+    # Least recently shown goes first, whatever was just added stays
+    budget.add('idle', 30, lambda: evicted.append('idle'))
+    budget.touch('walk')
+    budget.add('sleep', 30, lambda: evicted.append('sleep'))
+    assert evicted == ['idle']
+    assert budget.used == 90
+    budget.discard('walk')
+    budget.discard('sleep')
+    assert budget.used == 0
+
+def test_loader_skips_a_strip_built_meanwhile(app):
+    animation = deskpet.SpriteAnimation(deskpet.PetPack(GOOSE))
+    animation.acquire_size(96)
+    strip_key = animation.strip_key('idle-right', 96, 1.0)
+    used = deskpet.pixmap_budget.used
+    
+    # strip() scales synchronously while a loader job for the same level is still running
+    images = animation.scale_strip(*strip_key)
+    strip = animation.strip('idle-right', 96)
+    charged = deskpet.pixmap_budget.used - used
+    deskpet.asset_loader.finish(animation, strip_key, images)
+    assert deskpet.pixmap_budget.used - used == charged
+    assert animation.request_strip('idle-right', 96, queue=False) == strip
+    
+    animation.unload()
+    assert deskpet.pixmap_budget.used == used
+
+def test_failed_strips_are_not_queued_again(app, monkeypatch, capsys):
+    def broken(self, name, level):
+        raise OSError('corrupt sheet')
+    monkeypatch.setattr(deskpet.SpriteAnimation, 'scale_strip', broken)
+    animation = deskpet.SpriteAnimation(deskpet.PetPack(GOOSE))
+    animation.acquire_size(96)
+    
+    assert animation.request_strip('idle-right', 96) is None
+    deskpet.asset_loader.wait()
+    assert animation.strip_key('idle-right', 96, 1.0) in animation.failed_strips
+    
+    for _ in range(3):
+        assert animation.request_strip('idle-right', 96) is None
+        assert not deskpet.asset_loader.pending
+    assert capsys.readouterr().err.count('corrupt sheet') == 1
+    animation.unload()
+
+@pytest.fixture
+def engine(app):
+    engine = deskpet.PetEngine(None, seed=1)
+    yield engine
+    engine.despawn_all()
+
+def test_screen_change_keeps_hand_placed_pets(engine):
+    engine.screens.from_list([[[0, 0, 800, 600], [0, 0, 800, 600]]])
+    standing, placed, far = engine.spawn(3, sprite_size=96, max_travel=850)
+    simulation = engine.simulation
+    simulation.place(standing.slot, 300, 504)
+    simulation.place(placed.slot, 300, 200)
+    simulation.place(far.slot, 700, 100)
+    
+    # The task bar goes away: the floor drops 40 px, and the area loses its right side
+    engine.screens.from_list([[[0, 0, 800, 640], [0, 0, 600, 640]]])
+    engine.update_all_bounds()
+    assert standing.is_airborne
+    assert not placed.is_airborne
+    assert far.is_airborne
+    
+    for _ in range(100):
+        simulation.step(simulation.DT)
+    assert (float(simulation.x[standing.slot]), float(simulation.y[standing.slot])) == (300, 544)
+    assert (float(simulation.x[placed.slot]), float(simulation.y[placed.slot])) == (300, 200)
+    assert (float(simulation.x[far.slot]), float(simulation.y[far.slot])) == (504, 544)
+
+@pytest.fixture
+def server(app):
+    selector = deskpet.SpriteSelector(pack=GOOSE, seed=1)
+    server = deskpet.ControlServer(selector, f"deskpet-test-{os.getpid()}")
+    yield server
+    selector.engine.despawn_all()
+    server.server.close()
+
+def test_control_errors_become_replies(server, tmp_path):
+    engine = server.selector.engine
+    assert server.reply(b'not json')['ok'] is False
+    assert server.reply({'command': 'bogus'}) == {'ok': False, 'error': "unknown command 'bogus'"}
+    assert server.reply({'command': 'spawn', 'pack': str(tmp_path / 'missing')})['ok'] is False
+    # A directory without a manifest fails inside PetPack rather than up front
+    assert server.reply({'command': 'spawn', 'pack': str(tmp_path)})['ok'] is False
+    assert server.reply({'command': 'remind', 'name': 'Hydration', 'interval': 0})['ok'] is False
+    assert engine.pets == []
+    
+    assert server.reply({'command': 'spawn', 'count': 2}) == {'ok': True, 'pets': 2}
+    assert server.reply({'command': 'despawn'}) == {'ok': True, 'pets': 0}
+
+def test_failed_spawn_takes_back_every_pet(server, monkeypatch):
+    engine = server.selector.engine
+    server.reply({'command': 'spawn'})
+    simulation = engine.simulation
+    created = []
+    init_ui = deskpet.DesktopPet.initUI
+    
+    def fail_third(pet):
+        created.append(pet)
+        if len(created) == 3:
+            raise OSError('out of windows')
+        init_ui(pet)
+    monkeypatch.setattr(deskpet.DesktopPet, 'initUI', fail_third)
+    
+    reply = server.reply({'command': 'spawn', 'count': 4})
+    assert reply == {'ok': False, 'error': 'out of windows'}
+    assert len(engine.pets) == 1
+    assert {pet.slot for pet in created[:2]} <= set(simulation.free)
+    assert not any(pet.isVisible() for pet in created[:2])
+
+def test_trace_survives_a_killed_recording(tmp_path):
+    path = str(tmp_path / 'session.trace.gz')
+    recorder = deskpet.TraceRecorder(path, seed=4)
+    for step in range(30):
+        recorder.record(step * 0.1, 'tick')
+    # Never closed, as if the app was killed: everything up to the last flush is there
+    header, events = deskpet.read_trace(path)
+    assert header['seed'] == 4
+    assert 20 <= len(events) < 30
+    assert events[:2] == [[0.0, 'tick'], [0.1, 'tick']]
+    recorder.close()
+    assert len(deskpet.read_trace(path)[1]) == 30
+
+@pytest.mark.parametrize('content', [b'', b'not a trace', None])
+def test_unreadable_traces_are_refused(tmp_path, content):
+    path = str(tmp_path / 'broken.trace.gz')
+    if content is None:
+        with gzip.open(path, 'wt') as f:
+            f.write('{"version": 0}\n')
+    else:
+        with open(path, 'wb') as f:
+            f.write(content)
+    with pytest.raises(ValueError):
+        deskpet.read_trace(path)
+
+def test_resizing_never_waits_for_frames(engine):
+    pet, = engine.spawn(1, sprite_size=96, max_travel=850)
+    animation = pet.animation
+    pet.update_animation()
+    deskpet.asset_loader.wait()
+    name = pet.current_animation
+    big = animation.strip_key(name, 96, 1.0)
+    assert big in animation.strips
+    
+    # The 48 px level isn't scaled yet, the 96 px one stands in, drawn at the new size
+    pet.set_sprite_size(48)
+    frames = animation.request_strip(name, 48)
+    assert frames is not None
+    assert frames[0][2].width() <= 48
+    pet.update_animation()
+    assert pet.frame_target.width() <= 48
+    deskpet.asset_loader.wait()
+    small = animation.strip_key(name, 48, 1.0)
+    assert small in animation.strips
+    
+    # Going back finds the released level still built
+    pet.set_sprite_size(96)
+    assert big in animation.strips
+    assert animation.request_strip(name, 96, queue=False) is not None
+
+def test_still_state_with_a_new_animation_is_drawn(engine):
+    pet, = engine.spawn(1, sprite_size=96, max_travel=850)
+    pet.update_animation()
+    deskpet.asset_loader.wait()
+    # Parked on a paused clock, as in a still state
+    pet.clock.pause(engine.now())
+    pet.update_animation()
+    assert not pet.needs_frames()
+    
+    # Another still state with a different animation still gets its one frame
+    pet.current_animation = 'walking-left' if pet.current_animation != 'walking-left' else 'idle-right'
+    assert pet.needs_frames()
+    pet.update_animation()
+    assert pet.shown_animation == pet.current_animation
+    assert not pet.needs_frames()
+
+def test_second_server_leaves_a_live_one_alone(server):
+    name = server.server.serverName()
+    assert server.listening
+    assert deskpet.instance_running(name)
+    
+    second = deskpet.ControlServer(server.selector, name)
+    assert not second.listening
+    assert deskpet.instance_running(name)
+    assert server.server.isListening()
+    second.server.close()
+
+@pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason='local servers are named pipes here')
+def test_stale_socket_is_replaced(app, tmp_path):
+    # A socket file nobody listens on, as a crashed instance leaves behind
+    path = str(tmp_path / 'stale')
+    stale = socket.socket(socket.AF_UNIX)
+    stale.bind(path)
+    stale.close()
+    selector = deskpet.SpriteSelector(pack=GOOSE)
+    server = deskpet.ControlServer(selector, path)
+    assert server.listening
+    server.server.close()
+
+def test_despawn_removes_newest_pets_first(server):
+    engine = server.selector.engine
+    server.reply({'command': 'spawn', 'count': 4})
+    first, second = engine.pets[:2]
+    assert server.reply({'command': 'despawn', 'count': 2}) == {'ok': True, 'pets': 2}
+    assert engine.pets == [first, second]
+    assert server.reply({'command': 'despawn'}) == {'ok': True, 'pets': 0}
+    assert not first.isVisible() and not second.isVisible()
+
+def test_startup_options_are_refused_by_a_running_instance(monkeypatch, capsys):
+    sent = []
+    monkeypatch.setattr(deskpet, 'instance_running', lambda *args: True)
+    monkeypatch.setattr(deskpet, 'send_command', lambda request: sent.append(request) or {'ok': True, 'pets': 1})
+    monkeypatch.setattr(sys, 'argv', ['deskpet', '--overlay', '--seed', '7'])
+    assert deskpet.main() == 1
+    assert '--overlay, --seed' in capsys.readouterr().err
+    assert not sent
+    
+    # A spawn takes its pack along, so that one isn't refused
+    monkeypatch.setattr(sys, 'argv', ['deskpet', '--pack', GOOSE, 'spawn'])
+    assert deskpet.main() == 0
+    assert sent[0]['pack'] == os.path.abspath(GOOSE)
+
+def test_painted_colors_come_from_the_palette():
+    from PyQt5.QtGui import QColor
+    for name in ('accent', 'track', 'handle', 'panel', 'panel_border'):
+        assert QColor(deskpet.PALETTE[name]).isValid(), name
+    assert QColor(deskpet.PALETTE['panel']).alpha() == 245